@@ -0,0 +1,312 @@
+"""
+Benchmarks for the dataset-prep utilities in utils/.
+
+Generates reproducible synthetic vocal-like corpora, times split_audio_files,
+get_audio_total_length and delete_low_loudness_audio_files on them, and
+records files/s, audio-seconds/s and peak RSS as JSON. Run from the
+repository root:
+
+    python -m benchmarks.dataset_prep --scales small medium --formats wav flac mp3 --output bench.json
+    python -m benchmarks.dataset_prep --output new.json --compare bench.json
+
+Each measurement runs in a fresh process so peak RSS belongs to that utility alone.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+from queue import Empty
+
+import numpy as np
+
+from utils.audio_utils import export_audio_array, get_file_duration, list_audio_files
+
+# How often measure() checks whether the benchmark process is still alive.
+RESULT_POLL_SECONDS = 1.0
+
+# name -> (file count, seconds per file)
+SCALES = {
+    'small': (20, 10),
+    'medium': (100, 30),
+    'large': (84, 240),  # About the size of the 84-song demo corpus
+}
+
+SAMPLE_RATE = 44100
+BENCHMARKS = ["split", "length", "clean"]
+
+def synthesize_vocal(duration_seconds, seed, sample_rate=SAMPLE_RATE):
+    """
+    Generates a deterministic, vaguely vocal-like test signal.
+
+    Phrases of 1-6 s of a vibrato tone with harmonics and breath noise
+    alternate with 0.2-2 s pauses of low-level noise, so that splitting,
+    silence detection and loudness gating all have realistic work to do.
+
+    Args:
+        duration_seconds (float): Length of the signal.
+        seed (int): Seed for the random generator; the same seed gives the same signal.
+        sample_rate (int): The sample rate in Hz.
+
+    Returns:
+        numpy.ndarray: float32 samples of shape (frames, 1).
+    """
+    rng = np.random.default_rng(seed)
+    total_frames = int(duration_seconds * sample_rate)
+    signal = rng.normal(0.0, 0.001, total_frames).astype(np.float32)
+
+    position = 0
+    while position < total_frames:
+        phrase_frames = min(int(rng.uniform(1.0, 6.0) * sample_rate), total_frames - position)
+        t = np.arange(phrase_frames) / sample_rate
+        pitch = rng.uniform(150.0, 600.0)
+        phase = 2 * np.pi * np.cumsum(pitch * (1 + 0.02 * np.sin(2 * np.pi * 5.5 * t))) / sample_rate
+        tone = sum(np.sin(phase * harmonic) / harmonic for harmonic in (1, 2, 3))
+        envelope = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.05)
+        amplitude = 10 ** (rng.uniform(-18.0, -6.0) / 20)
+        signal[position:position + phrase_frames] += (
+            amplitude * envelope * (tone / 1.8 + rng.normal(0.0, 0.02, phrase_frames))
+        ).astype(np.float32)
+        position += phrase_frames + int(rng.uniform(0.2, 2.0) * sample_rate)
+
+    return np.clip(signal, -1.0, 1.0).reshape(-1, 1)
+
+def generate_corpus(directory, file_count, seconds_per_file, audio_format):
+    """
+    Writes a synthetic corpus, reusing it if it already exists with the same parameters.
+
+    Returns:
+        float: Total audio duration of the corpus in seconds.
+    """
+    marker_path = os.path.join(directory, ".corpus.json")
+    spec = {'file_count': file_count, 'seconds_per_file': seconds_per_file, 'format': audio_format}
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == spec:
+                return file_count * seconds_per_file
+        shutil.rmtree(directory)
+
+    os.makedirs(directory, exist_ok=True)
+    for i in range(file_count):
+        samples = synthesize_vocal(seconds_per_file, seed=i)
+        export_audio_array(samples, SAMPLE_RATE, os.path.join(directory, f"song_{i:04d}.{audio_format}"), audio_format)
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+    return file_count * seconds_per_file
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process and of its finished children, in bytes."""
+    import resource
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children)
+
+def _run_benchmark(name, corpus_directory, scratch_directory, audio_format, workers, queue):
+    """Runs one utility in this (fresh) process and puts its measurements on queue."""
+    from utils.audio_split import split_audio_files
+    from utils.audio_clean import delete_low_loudness_audio_files
+    from utils.audio_length_calc import get_audio_total_length
+
+    split_directory = os.path.join(scratch_directory, "split")
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            failed_files = 0
+            start_time = time.perf_counter()
+            if name == "split":
+                split_results = split_audio_files(corpus_directory, split_directory, audio_format=audio_format,
+                                                  segment_duration_ms=5000, workers=workers)
+                failed_files = sum(1 for result in split_results if result['status'] == 'error')
+            elif name == "length":
+                get_audio_total_length(corpus_directory, use_index=False)
+            elif name == "clean":
+                delete_low_loudness_audio_files(split_directory, -30.0, use_index=False, workers=workers)
+            elapsed = time.perf_counter() - start_time
+        if failed_files:
+            # A partial run is not comparable with a complete one, so it gets no time
+            queue.put({'seconds': None, 'peak_rss_bytes': _peak_rss_bytes(), 'error': f"{failed_files} files failed"})
+        else:
+            queue.put({'seconds': elapsed, 'peak_rss_bytes': _peak_rss_bytes(), 'error': None})
+    except Exception as e:
+        queue.put({'seconds': None, 'peak_rss_bytes': _peak_rss_bytes(), 'error': repr(e)})
+
+def measure(name, corpus_directory, scratch_directory, audio_format, workers):
+    """
+    Runs one benchmark in a spawned process and returns its measurements.
+
+    A child that dies without reporting (killed by the OOM killer, a crash in
+    native code) is reported as a failed measurement instead of blocking forever.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_run_benchmark,
+        args=(name, corpus_directory, scratch_directory, audio_format, workers, queue)
+    )
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=RESULT_POLL_SECONDS)
+        except Empty:
+            if not process.is_alive():
+                try:
+                    # The result may still be in flight from a child that just exited
+                    result = queue.get(timeout=RESULT_POLL_SECONDS)
+                except Empty:
+                    result = {'seconds': None, 'peak_rss_bytes': 0,
+                              'error': f"benchmark process exited with code {process.exitcode} without a result"}
+    process.join()
+    return result
+
+def _chunk_inventory(directory, audio_format):
+    """Returns (file count, total seconds) of the audio files actually present in directory."""
+    filepaths = list_audio_files(directory, [audio_format]) if os.path.isdir(directory) else []
+    return len(filepaths), sum(get_file_duration(filepath) or 0.0 for filepath in filepaths)
+
+def run_benchmarks(scales, formats, workdir, workers=1, benchmarks=None):
+    """
+    Runs every requested benchmark for every scale and format.
+
+    The clean benchmark operates on the chunks written by the split benchmark,
+    so "split" always runs first when "clean" is requested. Its throughput is
+    based on the chunks that exist, and it is skipped if the split failed.
+
+    Returns:
+        list: One result dict per (scale, format, benchmark).
+    """
+    benchmarks = benchmarks or BENCHMARKS
+    results = []
+    for scale in scales:
+        file_count, seconds_per_file = SCALES[scale]
+        for audio_format in formats:
+            corpus_directory = os.path.join(workdir, f"corpus_{scale}_{audio_format}")
+            print(f"Preparing {scale} corpus ({file_count} x {seconds_per_file}s {audio_format})...")
+            corpus_seconds = generate_corpus(corpus_directory, file_count, seconds_per_file, audio_format)
+
+            scratch_directory = os.path.join(workdir, f"scratch_{scale}_{audio_format}")
+            shutil.rmtree(scratch_directory, ignore_errors=True)
+            os.makedirs(scratch_directory)
+
+            ordered = [name for name in BENCHMARKS if name in benchmarks or (name == "split" and "clean" in benchmarks)]
+            split_error = None
+            for name in ordered:
+                if name == "clean":
+                    # Measured against the chunks produced by "split"
+                    files, audio_seconds = _chunk_inventory(os.path.join(scratch_directory, "split"), audio_format)
+                else:
+                    files, audio_seconds = file_count, corpus_seconds
+
+                if name == "clean" and (split_error or not files):
+                    measurement = {'seconds': None, 'peak_rss_bytes': 0,
+                                   'error': f"skipped, split failed ({split_error or 'no chunks'})"}
+                else:
+                    measurement = measure(name, corpus_directory, scratch_directory, audio_format, workers)
+                if name == "split":
+                    split_error = measurement['error']
+                seconds = measurement['seconds']
+                result = {
+                    'benchmark': name,
+                    'scale': scale,
+                    'format': audio_format,
+                    'workers': workers,
+                    'files': files,
+                    'audio_seconds': audio_seconds,
+                    'seconds': seconds,
+                    'files_per_second': files / seconds if seconds else None,
+                    'audio_seconds_per_second': audio_seconds / seconds if seconds else None,
+                    'peak_rss_mb': measurement['peak_rss_bytes'] / (1 << 20),
+                    'error': measurement['error'],
+                }
+                if name in benchmarks:
+                    results.append(result)
+                    _print_result(result)
+
+            shutil.rmtree(scratch_directory, ignore_errors=True)
+    return results
+
+def _print_result(result):
+    if result['seconds'] is None:
+        print(f"  {result['benchmark']:<7} {result['scale']:<7} {result['format']:<5} ERROR: {result['error']}")
+        return
+    print(f"  {result['benchmark']:<7} {result['scale']:<7} {result['format']:<5} "
+          f"{result['seconds']:8.2f}s {result['files_per_second']:9.1f} files/s "
+          f"{result['audio_seconds_per_second']:9.1f} audio-s/s {result['peak_rss_mb']:8.1f} MB peak RSS"
+          + (f"  ({result['error']})" if result['error'] else ""))
+
+def compare_results(results, baseline_path, tolerance=0.10):
+    """
+    Compares results with a previously saved run.
+
+    Args:
+        results (list): Results from run_benchmarks.
+        baseline_path (str): A JSON file written by an earlier run.
+        tolerance (float): Allowed slowdown before a result counts as a regression.
+
+    Returns:
+        list: Descriptions of the regressions found (empty if none).
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def key(result):
+        return (result['benchmark'], result['scale'], result['format'], result['workers'])
+
+    baseline_by_key = {key(result): result for result in baseline['results'] if not result['error']}
+    regressions = []
+    print(f"\n--- Comparison with {baseline_path} ---")
+    for result in results:
+        previous = baseline_by_key.get(key(result))
+        if previous is None or result['error']:
+            continue
+        ratio = result['seconds'] / previous['seconds']
+        line = (f"  {result['benchmark']:<7} {result['scale']:<7} {result['format']:<5} "
+                f"{previous['seconds']:8.2f}s -> {result['seconds']:8.2f}s ({ratio:.2f}x)")
+        if ratio > 1 + tolerance:
+            line += "  REGRESSION"
+            regressions.append(line.strip())
+        print(line)
+    return regressions
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the dataset-prep utilities on synthetic corpora.")
+    parser.add_argument("--scales", nargs="+", default=["small"], choices=list(SCALES))
+    parser.add_argument("--formats", nargs="+", default=["wav"], choices=["wav", "flac", "mp3"])
+    parser.add_argument("--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for split and clean")
+    parser.add_argument("--workdir", help="Where corpora are generated and kept between runs (default: a temp dir)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="A previous --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before flagging a regression")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "sovits_dataset_prep_bench")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = run_benchmarks(args.scales, args.formats, workdir, workers=args.workers, benchmarks=args.benchmarks)
+
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
@@ -1,6 +1,186 @@
-from spleeter.separator import Separator
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-# Using embedded configuration.
-separator = Separator('spleeter:2stems')
+# Stems written by each spleeter configuration; used to detect finished tracks.
+STEM_NAMES = {
+    'spleeter:2stems': ["vocals", "accompaniment"],
+    'spleeter:4stems': ["vocals", "drums", "bass", "other"],
+    'spleeter:5stems': ["vocals", "drums", "bass", "piano", "other"],
+}
 
-separator.separate_to_file(r'C:\CloudMusic\Mayday\Singles\五月天 - 为你写下这首情歌.mp3', 'output')
\ No newline at end of file
+def track_name_for(filepath, input_path):
+    """
+    Names a track after its path relative to input_path, without the extension.
+
+    "A/Intro.mp3" and "B/Intro.mp3" become "A/Intro" and "B/Intro", so songs
+    with the same title in different album folders get separate stem folders.
+    A single input file is named after its basename.
+    """
+    if os.path.isfile(input_path):
+        relative_path = os.path.basename(filepath)
+    else:
+        relative_path = os.path.relpath(filepath, input_path)
+    return os.path.splitext(relative_path)[0]
+
+def _stem_path(track_name, output_directory, stem, codec):
+    """Returns where one stem of a track is written (spleeter's default filename_format)."""
+    return os.path.join(output_directory, track_name, f"{stem}.{codec}")
+
+def _stem_paths(track_name, output_directory, model, codec):
+    """Returns the files written for one track, used to detect finished tracks."""
+    return [_stem_path(track_name, output_directory, stem, codec) for stem in STEM_NAMES.get(model, ["vocals"])]
+
+def separate_directory(
+    input_path,
+    output_directory="output",
+    model='spleeter:2stems',
+    supported_formats=None,
+    codec="wav",
+    sample_rate=44100,
+    prefetch=2,
+    overwrite=False
+):
+    """
+    Separates every track of a directory (or a single file) with one Separator.
+
+    The spleeter model is loaded once and reused for all tracks, which is most
+    of the cost of separating a single song. While one track is separated,
+    the next ones are decoded on a thread pool. Tracks whose stems already
+    exist are skipped unless overwrite is True. Runs on CPU if no GPU is present.
+
+    Args:
+        input_path (str): A directory to walk through, or a single audio file.
+        output_directory (str): Where stems are written, one subdirectory per
+                                track named by track_name_for, mirroring the
+                                input tree (output/<album>/<track>/vocals.wav).
+        model (str): The spleeter configuration. Default is 'spleeter:2stems'.
+        supported_formats (list, optional): Audio file extensions to process.
+        codec (str): Output codec for the stems. Default is "wav".
+        sample_rate (int): Rate the tracks are decoded at. Default is 44100,
+                           the rate spleeter's models expect.
+        prefetch (int): Number of tracks decoded ahead of the one being separated.
+        overwrite (bool): If True, separate tracks even if their stems exist.
+
+    Returns:
+        list: One dict per track with keys 'source', 'track' (the stem folder
+              relative to output_directory), 'status' ('separated', 'skipped'
+              or 'error'), 'decode_seconds', 'separate_seconds' and 'error'
+              (str or None).
+
+    Raises:
+        ValueError: If two sources map to the same stem folder (e.g. "Intro.mp3"
+                    and "Intro.flac" in one folder); nothing is separated.
+    """
+    if supported_formats is None:
+        supported_formats = ["mp3", "wav", "flac", "ogg", "aac", "m4a"]
+
+    if os.path.isfile(input_path):
+        track_files = [input_path]
+    else:
+        track_files = []
+        for root, _, files in os.walk(input_path):
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower().lstrip('.') in supported_formats:
+                    track_files.append(os.path.join(root, filename))
+
+    track_names = {}
+    sources_by_track = {}
+    for filepath in track_files:
+        track_name = track_name_for(filepath, input_path)
+        if track_name in sources_by_track:
+            raise ValueError(f"{sources_by_track[track_name]} and {filepath} would both be separated into "
+                             f"{os.path.join(output_directory, track_name)}; rename one of them")
+        sources_by_track[track_name] = filepath
+        track_names[filepath] = track_name
+
+    results = []
+    pending_files = []
+    for filepath in track_files:
+        stem_paths = _stem_paths(track_names[filepath], output_directory, model, codec)
+        if not overwrite and all(os.path.exists(path) for path in stem_paths):
+            results.append({'source': filepath, 'track': track_names[filepath], 'status': 'skipped',
+                            'decode_seconds': 0.0, 'separate_seconds': 0.0, 'error': None})
+        else:
+            pending_files.append(filepath)
+
+    print(f"Separating {len(pending_files)} tracks with {model} "
+          f"({len(track_files) - len(pending_files)} already separated)")
+    if not pending_files:
+        return results
+
+    # Imported here so the module (and --help, and runs with nothing to do) load
+    # without TensorFlow start-up cost
+    from spleeter.audio.adapter import AudioAdapter
+    from spleeter.separator import Separator
+
+    audio_adapter = AudioAdapter.default()
+
+    def load(filepath):
+        start_time = time.perf_counter()
+        waveform, _ = audio_adapter.load(filepath, sample_rate=sample_rate)
+        return waveform, time.perf_counter() - start_time
+
+    load_start_time = time.perf_counter()
+    separator = Separator(model)
+    print(f"Loaded {model} in {time.perf_counter() - load_start_time:.1f}s")
+
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+        # Keep up to `prefetch` decodes queued ahead of the separation loop
+        futures = [executor.submit(load, filepath) for filepath in pending_files[:prefetch]]
+        for i, filepath in enumerate(pending_files):
+            if i + prefetch < len(pending_files):
+                futures.append(executor.submit(load, pending_files[i + prefetch]))
+
+            track_name = track_names[filepath]
+            result = {'source': filepath, 'track': track_name, 'status': 'separated',
+                      'decode_seconds': 0.0, 'separate_seconds': 0.0, 'error': None}
+            try:
+                waveform, result['decode_seconds'] = futures[i].result()
+                futures[i] = None  # Release the decoded waveform once it is used
+
+                start_time = time.perf_counter()
+                prediction = separator.separate(waveform)
+                os.makedirs(os.path.join(output_directory, track_name), exist_ok=True)
+                for stem, data in prediction.items():
+                    audio_adapter.save(_stem_path(track_name, output_directory, stem, codec), data, sample_rate, codec)
+                result['separate_seconds'] = time.perf_counter() - start_time
+                print(f"  Separated: {filepath} (decode {result['decode_seconds']:.1f}s, "
+                      f"separate {result['separate_seconds']:.1f}s)")
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = str(e)
+                print(f"  Error separating {filepath}: {e}")
+            results.append(result)
+
+    separated = [result for result in results if result['status'] == 'separated']
+    print(f"\n--- Separation Summary ---")
+    print(f"Separated: {len(separated)}, skipped: {sum(1 for r in results if r['status'] == 'skipped')}, "
+          f"failed: {sum(1 for r in results if r['status'] == 'error')}")
+    if separated:
+        print(f"Total decode time: {sum(r['decode_seconds'] for r in separated):.1f}s, "
+              f"total separation time: {sum(r['separate_seconds'] for r in separated):.1f}s")
+
+    return results
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Separate vocals from every track in a directory with spleeter.")
+    parser.add_argument("input_path", help="Directory of songs (walked recursively) or a single file")
+    parser.add_argument("-o", "--output", default="output", help="Output directory for the stems")
+    parser.add_argument("-p", "--model", default="spleeter:2stems", help="Spleeter configuration")
+    parser.add_argument("-c", "--codec", default="wav", help="Output codec for the stems")
+    parser.add_argument("--prefetch", type=int, default=2, help="Tracks decoded ahead of separation")
+    parser.add_argument("--overwrite", action="store_true", help="Separate tracks whose stems already exist")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    separate_directory(
+        args.input_path,
+        output_directory=args.output,
+        model=args.model,
+        codec=args.codec,
+        prefetch=args.prefetch,
+        overwrite=args.overwrite
+    )
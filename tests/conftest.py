@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+
+from utils.audio_utils import write_wav_array
+
+SAMPLE_RATE = 16000
+
+def tone(seconds, frequency=220.0, level=0.5, sample_rate=SAMPLE_RATE):
+    """A sine tone of the given peak level, as a 1-D float array."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return level * np.sin(2 * np.pi * frequency * t)
+
+def silence(seconds, sample_rate=SAMPLE_RATE):
+    """Digital silence, as a 1-D float array."""
+    return np.zeros(int(seconds * sample_rate))
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE):
+    """Writes 1-D float samples in [-1, 1] as a mono 16-bit WAV file, creating its directory."""
+    path = str(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pcm = (np.asarray(samples) * 32767).astype(np.int16).reshape(-1, 1)
+    write_wav_array(pcm, sample_rate, path)
+    return path
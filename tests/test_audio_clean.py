@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+from tests.conftest import SAMPLE_RATE, silence, tone, write_wav
+from utils import audio_utils
+from utils.audio_clean import delete_low_loudness_audio_files
+from utils.audio_utils import amplitude_to_dbfs, compute_audio_metrics, frame_rms, voiced_fraction
+
+def test_voiced_fraction_matches_frame_levels():
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(SAMPLE_RATE * 3) * np.repeat(rng.uniform(0, 0.3, 150), 320)).reshape(-1, 1)
+    record = compute_audio_metrics(samples, SAMPLE_RATE)
+    levels = amplitude_to_dbfs(frame_rms(samples[:, 0], SAMPLE_RATE * 20 // 1000))
+    for threshold in (-60.0, -40.0, -25.5, -12.0):
+        assert voiced_fraction(record, threshold) == np.count_nonzero(levels >= threshold) / len(levels)
+
+def test_voiced_gating_reuses_the_index_across_thresholds(tmp_path, monkeypatch):
+    write_wav(tmp_path / "mostly_voiced.wav", np.concatenate([tone(3, level=0.1), silence(1)]))
+    write_wav(tmp_path / "mostly_silent.wav", np.concatenate([tone(1, level=0.1), silence(3)]))
+
+    decoded = []
+    load_audio_array = audio_utils.load_audio_array
+    def counting_load(filepath, file_extension=None):
+        decoded.append(filepath)
+        return load_audio_array(filepath, file_extension)
+    monkeypatch.setattr(audio_utils, "load_audio_array", counting_load)
+
+    delete_low_loudness_audio_files(str(tmp_path), -60.0, gating="voiced", quiet=True)
+    assert len(decoded) == 2
+    assert sorted(os.listdir(tmp_path)) == [".audio_index.sqlite", "mostly_voiced.wav"]
+
+    # The tone sits around -23 dBFS, so a stricter threshold drops it without decoding it again
+    delete_low_loudness_audio_files(str(tmp_path), -10.0, gating="voiced", quiet=True)
+    assert len(decoded) == 2
+    assert os.listdir(tmp_path) == [".audio_index.sqlite"]
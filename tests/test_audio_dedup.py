@@ -0,0 +1,48 @@
+import numpy as np
+
+from utils.audio_dedup import (
+    FINGERPRINT_BITS,
+    FINGERPRINT_SAMPLE_RATE,
+    _group_pairs,
+    _split_group,
+    compute_fingerprint,
+    find_near_duplicates,
+    hamming_distances,
+)
+
+def _flip(fingerprint, bits):
+    unpacked = np.unpackbits(fingerprint)
+    unpacked[bits] ^= 1
+    return np.packbits(unpacked)
+
+def test_chained_duplicates_only_remove_chunks_close_to_the_keeper():
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, FINGERPRINT_BITS // 8, dtype=np.uint8)
+    b = _flip(a, np.arange(0, 20))
+    c = _flip(b, np.arange(20, 40))
+    fingerprints = np.stack([a, b, c])
+
+    pairs = find_near_duplicates(fingerprints, 25, bands=16)
+    assert set(pairs) == {(0, 1), (1, 2)}
+    groups = _group_pairs(3, pairs)
+    assert groups == [[0, 1, 2]]
+
+    # A is the longest chunk: B is its duplicate, C is 40 bits from A and survives
+    assert _split_group(groups[0], [300, 200, 100], fingerprints, 25) == [(0, [(1, 20)])]
+    # B is the longest chunk: both neighbours are within reach of it
+    assert _split_group(groups[0], [200, 300, 100], fingerprints, 25) == [(1, [(0, 20), (2, 20)])]
+
+def test_fingerprint_ignores_energy_above_the_top_band():
+    rng = np.random.default_rng(1)
+    t = np.arange(3 * FINGERPRINT_SAMPLE_RATE) / FINGERPRINT_SAMPLE_RATE
+    # A melody of 60 ms notes inside the fingerprint range
+    notes = np.repeat(rng.uniform(300.0, 3000.0, 50), len(t) // 50 + 1)[:len(t)]
+    phrase = 0.3 * np.sin(2 * np.pi * np.cumsum(notes) / FINGERPRINT_SAMPLE_RATE)
+    # Loud hiss between 3.6 kHz and Nyquist
+    spectrum = np.fft.rfft(rng.standard_normal(len(t)))
+    spectrum[np.fft.rfftfreq(len(t), 1 / FINGERPRINT_SAMPLE_RATE) < 3600.0] = 0
+    hiss = 0.3 * np.fft.irfft(spectrum, len(t)) / np.abs(np.fft.irfft(spectrum, len(t))).max()
+
+    clean = np.frombuffer(compute_fingerprint(phrase.reshape(-1, 1), FINGERPRINT_SAMPLE_RATE), dtype=np.uint8)
+    noisy = np.frombuffer(compute_fingerprint((phrase + hiss).reshape(-1, 1), FINGERPRINT_SAMPLE_RATE), dtype=np.uint8)
+    assert hamming_distances(noisy, clean) == 0
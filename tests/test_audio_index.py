@@ -0,0 +1,16 @@
+from tests.conftest import tone, write_wav
+from utils import audio_index
+from utils.audio_index import AudioIndex
+
+def test_stored_records_survive_an_interrupted_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_index, "COMMIT_INTERVAL", 2)
+    filepaths = [write_wav(tmp_path / f"chunk_{i}.wav", tone(0.1)) for i in range(3)]
+
+    index = AudioIndex(str(tmp_path))
+    for duration, filepath in enumerate(filepaths):
+        index.store(filepath, duration=float(duration))
+    # Simulate a crash: the connection goes away without close()
+    index.connection.rollback()
+
+    with AudioIndex(str(tmp_path)) as reopened:
+        assert [(reopened.lookup(filepath) or {}).get('duration') for filepath in filepaths] == [0.0, 1.0, None]
@@ -0,0 +1,19 @@
+import os
+
+from tests.conftest import tone, write_wav
+from utils.audio_remix import remix_directory
+
+def test_same_titled_tracks_are_mixed_with_their_own_accompaniment(tmp_path):
+    for album, frequency in (("A", 220.0), ("B", 330.0)):
+        write_wav(tmp_path / "separated" / album / "Intro" / "accompaniment.wav", tone(1, frequency, 0.2))
+        write_wav(tmp_path / "separated" / album / "Intro" / "vocals.wav", tone(1, 440.0, 0.2))
+        write_wav(tmp_path / "converted" / album / "Intro.wav_0key_singer.wav", tone(1, 440.0, 0.2))
+
+    results = remix_directory(str(tmp_path / "converted"), str(tmp_path / "separated"),
+                              str(tmp_path / "remixed"), quiet=True)
+
+    assert [result['status'] for result in results] == ['mixed', 'mixed']
+    assert [os.path.relpath(result['accompaniment'], tmp_path / "separated") for result in results] == [
+        os.path.join("A", "Intro", "accompaniment.wav"), os.path.join("B", "Intro", "accompaniment.wav")]
+    a = (tmp_path / "remixed" / "A" / "Intro.wav_0key_singer.wav").read_bytes()
+    assert a != (tmp_path / "remixed" / "B" / "Intro.wav_0key_singer.wav").read_bytes()
@@ -0,0 +1,18 @@
+import numpy as np
+
+from tests.conftest import SAMPLE_RATE, silence, tone, write_wav
+from utils.audio_split import _stream_segments
+from utils.audio_utils import find_segment_boundaries
+
+SEGMENT_OPTIONS = {'min_segment_ms': 5000, 'max_segment_ms': 10000, 'silence_thresh': -40.0}
+
+def test_streamed_silence_segments_keep_phrase_straddling_buffer_edge(tmp_path):
+    # The 8 s phrase runs past safe_end of the first 30 s streaming buffer
+    samples = np.concatenate([silence(16), tone(8), silence(3), tone(7), silence(20)])
+    filepath = write_wav(tmp_path / "phrases.wav", samples)
+
+    full_frames = sum(end - start for start, end in find_segment_boundaries(samples.reshape(-1, 1), SAMPLE_RATE, **SEGMENT_OPTIONS))
+    streamed = [chunk for chunk, _ in _stream_segments(filepath, "wav", "silence", 5000, SEGMENT_OPTIONS)]
+
+    assert sum(len(chunk) for chunk in streamed) == full_frames
+    assert max(len(chunk) for chunk in streamed) >= 8 * SAMPLE_RATE
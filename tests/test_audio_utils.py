@@ -0,0 +1,23 @@
+import numpy as np
+
+from tests.conftest import SAMPLE_RATE, silence, tone
+from utils.audio_utils import find_segment_boundaries
+
+def _boundaries(samples):
+    return find_segment_boundaries(samples.reshape(-1, 1), SAMPLE_RATE, min_segment_ms=5000, max_segment_ms=10000)
+
+def test_long_phrase_is_cut_into_adjacent_chunks_within_max():
+    boundaries = _boundaries(tone(25))
+    assert boundaries[0][0] == 0 and boundaries[-1][1] == 25 * SAMPLE_RATE
+    assert all(previous[1] == following[0] for previous, following in zip(boundaries, boundaries[1:]))
+    assert all(5 * SAMPLE_RATE <= end - start <= 10 * SAMPLE_RATE for start, end in boundaries)
+
+def test_phrases_are_not_joined_across_long_silences():
+    samples = np.concatenate([tone(2), silence(5), tone(2), silence(10), tone(1)])
+    padding = SAMPLE_RATE // 10
+    # The 1 s phrase is below min_keep_ms
+    assert _boundaries(samples) == [(0, 2 * SAMPLE_RATE + padding), (7 * SAMPLE_RATE - padding, 9 * SAMPLE_RATE + padding)]
+
+def test_padding_does_not_push_a_chunk_past_max():
+    (start, end), = _boundaries(np.concatenate([silence(1), tone(9.96), silence(1)]))
+    assert end - start <= 10 * SAMPLE_RATE
@@ -0,0 +1,31 @@
+import threading
+import time
+
+from utils.audio_split import ExportQueue
+
+def test_export_queue_bounds_pending_chunks_and_reports_failures_per_chunk(tmp_path):
+    lock = threading.Lock()
+    pending = [0]
+    most_pending = [0]
+
+    def export(chunk, output_filepath):
+        time.sleep(0.01)
+        with lock:
+            pending[0] -= 1
+        if chunk == 3:
+            raise OSError("disk full")
+
+    result = {'source': "song.wav", 'status': 'ok', 'chunks': [], 'error': None}
+    with ExportQueue(threads=2, max_pending=2) as export_queue:
+        for chunk in range(6):
+            with lock:
+                pending[0] += 1
+                most_pending[0] = max(most_pending[0], pending[0])
+            export_queue.submit("song.wav", str(tmp_path / f"song_{chunk}.wav"), export, chunk)
+        export_queue.collect(result)
+
+    # One chunk may be counted just before submit() blocks on a full queue
+    assert most_pending[0] <= 3
+    assert result['chunks'] == [f"song_{chunk}.wav" for chunk in (0, 1, 2, 4, 5)]
+    assert result['status'] == 'error'
+    assert "song_3.wav: disk full" in result['error']
@@ -0,0 +1,38 @@
+import os
+
+import spleeter_sep.seperate
+from tests.conftest import tone, write_wav
+from utils import prepare_dataset
+
+def _fake_separate_directory(input_path, output_directory, **kwargs):
+    results = []
+    for root, _, files in os.walk(input_path):
+        for filename in files:
+            source = os.path.join(root, filename)
+            track = spleeter_sep.seperate.track_name_for(source, input_path)
+            os.makedirs(os.path.join(output_directory, track))
+            os.link(source, os.path.join(output_directory, track, "vocals.wav"))
+            results.append({'source': source, 'track': track, 'status': 'separated'})
+    return results
+
+def test_same_titled_songs_keep_separate_vocals(tmp_path, monkeypatch):
+    monkeypatch.setattr(spleeter_sep.seperate, "separate_directory", _fake_separate_directory)
+    for album, frequency in (("A", 220.0), ("B", 330.0)):
+        write_wav(tmp_path / "songs" / album / "Intro.wav", tone(1, frequency))
+
+    args = prepare_dataset._parse_args([str(tmp_path / "songs"), str(tmp_path / "work"), "--stages", "separate", "--quiet"])
+    assert prepare_dataset.prepare_dataset(args)
+
+    vocals = tmp_path / "work" / "vocals"
+    assert (vocals / "A" / "Intro.wav").read_bytes() != (vocals / "B" / "Intro.wav").read_bytes()
+
+def test_new_songs_are_picked_up_by_a_rerun(tmp_path):
+    write_wav(tmp_path / "vocals" / "first.wav", tone(2))
+    argv = [str(tmp_path / "vocals"), str(tmp_path / "work"), "--no-separate", "--stages", "split",
+            "--segmentation", "fixed", "--segment-ms", "1000", "--quiet"]
+    assert prepare_dataset.prepare_dataset(prepare_dataset._parse_args(argv))
+    assert len(os.listdir(tmp_path / "work" / "chunks")) == 3  # 2 chunks and the split manifest
+
+    write_wav(tmp_path / "vocals" / "second.wav", tone(2, 330.0))
+    assert prepare_dataset.prepare_dataset(prepare_dataset._parse_args(argv))
+    assert len(os.listdir(tmp_path / "work" / "chunks")) == 5
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from spleeter_sep.seperate import separate_directory, track_name_for
+
+def test_track_names_mirror_album_folders(tmp_path):
+    first = track_name_for(str(tmp_path / "A" / "Intro.mp3"), str(tmp_path))
+    second = track_name_for(str(tmp_path / "B" / "Intro.mp3"), str(tmp_path))
+    assert first == os.path.join("A", "Intro")
+    assert second == os.path.join("B", "Intro")
+
+def test_sources_sharing_a_stem_folder_are_refused(tmp_path):
+    (tmp_path / "Intro.mp3").write_bytes(b"")
+    (tmp_path / "Intro.flac").write_bytes(b"")
+    with pytest.raises(ValueError):
+        separate_directory(str(tmp_path), output_directory=str(tmp_path / "output"))
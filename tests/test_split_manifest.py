@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from tests.conftest import silence, tone, write_wav
+from utils.audio_clean import delete_low_loudness_audio_files
+from utils.audio_split import split_audio_files
+
+def _chunks(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".wav"))
+
+def test_incremental_split_does_not_restore_cleaned_chunks(tmp_path):
+    write_wav(tmp_path / "songs" / "first.wav", np.concatenate([tone(3), silence(1)]))
+    output = str(tmp_path / "split")
+    options = {'segment_duration_ms': 1000, 'incremental': True, 'quiet': True}
+
+    assert [result['status'] for result in split_audio_files(str(tmp_path / "songs"), output, **options)] == ['ok']
+    delete_low_loudness_audio_files(output, -40.0, quiet=True)
+    cleaned = _chunks(output)
+    assert len(cleaned) == 3
+
+    # A new single arrives; the cleaned song is not split again
+    write_wav(tmp_path / "songs" / "second.wav", tone(2, 330.0))
+    results = split_audio_files(str(tmp_path / "songs"), output, **options)
+
+    assert {os.path.basename(result['source']): result['status'] for result in results} == {
+        'first.wav': 'skipped', 'second.wav': 'ok'}
+    assert [sorted(result['chunks']) for result in results if result['status'] == 'skipped'] == [cleaned]
+    assert len(_chunks(output)) == 5
@@ -1,16 +1,55 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 # Updated import line to include all necessary functions from audio_utils
 from utils.audio_utils import (
-    is_supported_audio_file,
+    list_audio_files,
+    remove_from_chunk_list,
     check_and_delete_if_low_loudness,
-    get_audio_total_length,  # Added for completeness, though not used in __main__
+    analyze_audio,
+    get_cached_analysis,
+    GATING_MODES,
     format_duration          # Added for completeness, though not used in __main__
 )
+from utils.audio_length_calc import get_audio_total_length  # Added for completeness, though not used in __main__
+from utils.audio_index import AudioIndex
+from utils.instrumentation import RunMetrics, capture_stages, merge_stages, log
 
 # Local definitions of get_audio_total_length and format_duration are now removed.
 # Their pydub-specific imports are also gone along with them.
 
-def delete_low_loudness_audio_files(directory_path, loudness_threshold_dbfs, supported_formats=None):
+def _analyze_file(filepath):
+    """Pool task: analyze_audio plus the stage timings it took, as (record, stages)."""
+    with capture_stages() as stages:
+        record = analyze_audio(filepath, None, None, "loudness")
+    return record, stages
+
+def _analyze_in_pool(filepaths, workers):
+    """
+    Analyses files on a process pool.
+
+    Returns:
+        tuple: (records, stages) where records maps filepath -> analyze_audio
+               record (None if the file could not be decoded) and stages maps
+               filepath -> the worker's stage timings for it.
+    """
+    records = {}
+    stages = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_analyze_file, filepath)
+            for filepath in filepaths
+        ]
+        for filepath, future in zip(filepaths, futures):
+            try:
+                records[filepath], stages[filepath] = future.result()
+            except Exception as e:
+                print(f"Warning: Error processing {filepath} for loudness: {e}")
+                records[filepath] = None
+    return records, stages
+
+def delete_low_loudness_audio_files(directory_path, loudness_threshold_dbfs, supported_formats=None,
+                                    use_index=True, index_path=None, gating="dbfs",
+                                    min_voiced_fraction=0.5, workers=1, metrics_path=None, quiet=False):
     """
     Walks through a directory, checks the loudness of audio files using audio_utils,
     and deletes those whose loudness is lower than the specified threshold.
@@ -19,6 +58,23 @@ def delete_low_loudness_audio_files(directory_path, loudness_threshold_dbfs, sup
         directory_path (str): The path to the directory to scan.
         loudness_threshold_dbfs (float): The loudness threshold in dBFS.
         supported_formats (list, optional): A list of audio file extensions.
+        use_index (bool): If True (default), cache per-file loudness in an
+                          utils.audio_index.AudioIndex so that re-running with a
+                          different threshold only decodes new or changed files.
+        index_path (str, optional): Location of the index file. Defaults to
+                                    a hidden SQLite file inside directory_path.
+        gating (str): How a file is judged, see audio_utils.gate_audio_record:
+                      "dbfs" (default) uses the whole-file dBFS, "gated" the
+                      loudness of its non-silent blocks, and "voiced" the share
+                      of 20 ms frames at or above loudness_threshold_dbfs.
+        min_voiced_fraction (float): Minimum share of voiced frames to keep a
+                                     file in "voiced" mode. Default is 0.5.
+        workers (int): Number of worker processes used to decode and analyse
+                       files. Each file is still decoded only once.
+        metrics_path (str, optional): If given, write per-file outcomes and
+                                      decode/analyse timings to this JSON lines
+                                      file (see utils.instrumentation.RunMetrics).
+        quiet (bool): If True, drop the per-file "Checking/KEPT/DELETED" lines.
     """
     if supported_formats is None:
         supported_formats = ["mp3", "wav", "flac", "ogg", "aac", "m4a"]
@@ -32,28 +88,69 @@ def delete_low_loudness_audio_files(directory_path, loudness_threshold_dbfs, sup
     print(f"Loudness threshold: {loudness_threshold_dbfs} dBFS")
     print(f"Supported audio formats: {', '.join(supported_formats)}")
 
+    if gating not in GATING_MODES:
+        print(f"Warning: Invalid gating '{gating}'. Defaulting to 'dbfs'.")
+        gating = "dbfs"
+    print(f"Gating mode: {gating}")
+
     if not os.path.isdir(directory_path):
         print(f"Error: Directory '{directory_path}' not found.")
         return
 
-    for root, _, files in os.walk(directory_path):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            if is_supported_audio_file(filename, supported_formats):
+    filepaths = list_audio_files(directory_path, supported_formats)
+    deleted_filepaths = []
+
+    with RunMetrics("clean", metrics_path, quiet) as metrics:
+        index = AudioIndex(directory_path, index_path) if use_index else None
+        try:
+            records = {}
+            worker_stages = {}
+            if workers is not None and workers > 1:
+                pending = [
+                    filepath for filepath in filepaths
+                    if index is None or get_cached_analysis(index, filepath) is None
+                ]
+                print(f"Analysing {len(pending)} new or changed files with {workers} worker processes")
+                records, worker_stages = _analyze_in_pool(pending, workers)
+                if index is not None:
+                    for filepath, record in records.items():
+                        if record is not None:
+                            index.store(filepath, **record)
+
+            for filepath in filepaths:
                 checked_files_count += 1
-                # file_extension is inferred by check_and_delete_if_low_loudness
-                status = check_and_delete_if_low_loudness(filepath, loudness_threshold_dbfs)
+                if filepath in records and records[filepath] is None:
+                    # Already reported by the worker; do not decode it a second time here
+                    log(f"  Skipped (loudness check failed): {os.path.basename(filepath)}")
+                    skipped_files_count += 1
+                    metrics.file_done(filepath, 'skipped_error', worker_stages.get(filepath))
+                    continue
+
+                with capture_stages() as stages:
+                    # file_extension is inferred by check_and_delete_if_low_loudness
+                    status = check_and_delete_if_low_loudness(
+                        filepath, loudness_threshold_dbfs, index=index, gating=gating,
+                        min_voiced_fraction=min_voiced_fraction, record=records.get(filepath)
+                    )
+                metrics.file_done(filepath, status, merge_stages(worker_stages.get(filepath), stages))
 
                 if status == 'deleted':
                     deleted_files_count += 1
+                    deleted_filepaths.append(filepath)
                 elif status == 'skipped_error' or status == 'delete_failed':
                     skipped_files_count += 1
                 # 'kept' status does not require special counting beyond being 'checked'
+        finally:
+            remove_from_chunk_list(directory_path, deleted_filepaths)
+            if index is not None:
+                index.prune()
+                index.close()
 
     print(f"\n--- Deletion Summary ---")
     print(f"Total files checked (supported types): {checked_files_count}")
     print(f"Total files deleted: {deleted_files_count}")
     print(f"Total files skipped (errors or delete failed): {skipped_files_count}")
+    metrics.print_summary()
 
 
 # --- Example Usage ---
@@ -0,0 +1,370 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.audio_utils import (
+    list_audio_files,
+    remove_from_chunk_list,
+    load_audio_array,
+    resample_audio,
+    amplitude_to_dbfs
+)
+from utils.audio_index import AudioIndex
+from utils.instrumentation import RunMetrics, capture_stages, merge_stages, timed, log
+
+# Fingerprint layout. Chunks are analysed at 8 kHz in 128 ms frames. Frame
+# energies are summed into FINGERPRINT_BANDS log-spaced bands covering the
+# vocal range, and pooled into FINGERPRINT_SLOTS equal slices of the chunk.
+# Each bit is the sign of the band-and-time energy gradient (as in the
+# Haitsma-Kalker audio fingerprint), so a fingerprint does not depend on gain
+# and tolerates re-encoding, resampling and small changes in chunk length.
+# Levels more than FINGERPRINT_FLOOR_DB below the loudest cell are clamped,
+# so the noise floor between phrases does not contribute random bits.
+# Chunks cut at different positions (e.g. a live take) are not matched.
+FINGERPRINT_SAMPLE_RATE = 8000
+FINGERPRINT_FRAME = 1024
+FINGERPRINT_HOP = 512
+FINGERPRINT_BANDS = 17
+FINGERPRINT_SLOTS = 33
+FINGERPRINT_MIN_HZ = 300.0
+FINGERPRINT_MAX_HZ = 3400.0
+FINGERPRINT_FLOOR_DB = 30.0
+FINGERPRINT_BITS = (FINGERPRINT_BANDS - 1) * (FINGERPRINT_SLOTS - 1)  # 512 bits = 64 bytes
+# Bump when the layout above changes so cached fingerprints are recomputed.
+FINGERPRINT_VERSION = 2
+# Chunks quieter than this have no usable fingerprint and are never reported.
+FINGERPRINT_MIN_DBFS = -60.0
+
+# Set bits per byte value, for Hamming distances on packed fingerprints.
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+@timed("fingerprint")
+def compute_fingerprint(samples, sample_rate):
+    """
+    Computes the spectral fingerprint of a chunk.
+
+    Args:
+        samples (numpy.ndarray): Float samples, shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+
+    Returns:
+        bytes or None: FINGERPRINT_BITS packed bits, or None if the chunk is
+                       too quiet to fingerprint.
+    """
+    mono = resample_audio(samples.mean(axis=1, keepdims=True), sample_rate, FINGERPRINT_SAMPLE_RATE)[:, 0]
+    if len(mono) == 0 or amplitude_to_dbfs(np.sqrt(np.mean(np.square(mono, dtype=np.float64)))) < FINGERPRINT_MIN_DBFS:
+        return None
+    if len(mono) < FINGERPRINT_FRAME:
+        mono = np.pad(mono, (0, FINGERPRINT_FRAME - len(mono)))
+
+    frames = np.lib.stride_tricks.sliding_window_view(mono, FINGERPRINT_FRAME)[::FINGERPRINT_HOP]
+    power = np.square(np.abs(np.fft.rfft(frames * np.hanning(FINGERPRINT_FRAME), axis=1)))
+
+    # Sum FFT bins into log-spaced bands
+    band_edges_hz = np.geomspace(FINGERPRINT_MIN_HZ, FINGERPRINT_MAX_HZ, FINGERPRINT_BANDS + 1)
+    band_edges = np.round(band_edges_hz * FINGERPRINT_FRAME / FINGERPRINT_SAMPLE_RATE).astype(int)
+    # Cut the spectrum at the top edge first, or the last band would run up to Nyquist
+    band_energy = np.add.reduceat(power[:, band_edges[0]:band_edges[-1]], band_edges[:-1] - band_edges[0], axis=1)
+
+    # Pool frames into FINGERPRINT_SLOTS slices of the chunk (repeat frames of very short chunks)
+    frame_count = len(band_energy)
+    if frame_count >= FINGERPRINT_SLOTS:
+        slot_edges = np.linspace(0, frame_count, FINGERPRINT_SLOTS + 1).astype(int)[:-1]
+        slot_energy = np.add.reduceat(band_energy, slot_edges, axis=0)
+    else:
+        slot_energy = band_energy[np.linspace(0, frame_count - 1, FINGERPRINT_SLOTS).round().astype(int)]
+
+    levels = 10.0 * np.log10(slot_energy + 1e-20)
+    levels = np.maximum(levels, levels.max() - FINGERPRINT_FLOOR_DB)
+    bits = np.diff(np.diff(levels, axis=1), axis=0) > 0
+    return np.packbits(bits).tobytes()
+
+def _fingerprint_file(filepath):
+    """Pool task: fingerprints one file and returns (fingerprint, stages, error)."""
+    with capture_stages() as stages:
+        try:
+            samples, sample_rate = load_audio_array(filepath)
+            fingerprint = compute_fingerprint(samples, sample_rate)
+            error = None
+        except Exception as e:
+            fingerprint, error = None, str(e)
+    return fingerprint, stages, error
+
+def hamming_distances(fingerprints, reference):
+    """Number of differing bits between each row of fingerprints (uint8, packed) and reference."""
+    return _POPCOUNT[np.bitwise_xor(fingerprints, reference)].sum(axis=-1)
+
+@timed("match")
+def find_near_duplicates(fingerprints, max_distance, bands=16):
+    """
+    Finds pairs of fingerprints within max_distance bits of each other.
+
+    Locality-sensitive hashing by banding: the bits are split into `bands`
+    equal bands, and fingerprints are only compared when at least one band is
+    identical. Per band, the band values are sorted and runs of equal values
+    form the candidate buckets, so the cost grows with n log n and the size of
+    the buckets rather than with n². Band values with fewer set bits than one
+    per byte (mostly pauses clamped to the level floor) say little about the
+    chunk and would form huge buckets, so they are not used as keys.
+
+    Args:
+        fingerprints (numpy.ndarray): uint8 array of shape (n, FINGERPRINT_BITS // 8).
+        max_distance (int): Maximum Hamming distance of a reported pair.
+        bands (int): Number of bands; must divide the fingerprint length in bytes.
+                     More bands find more distant pairs at the cost of more
+                     candidate comparisons.
+
+    Returns:
+        dict: (i, j) -> Hamming distance, with i < j, for every near-duplicate pair.
+    """
+    count, width = fingerprints.shape
+    band_width = width // bands
+    pairs = {}
+    if count < 2:
+        return pairs
+
+    for band in range(bands):
+        values = fingerprints[:, band * band_width:(band + 1) * band_width]
+        informative = np.flatnonzero(_POPCOUNT[values].sum(axis=1) >= band_width)
+        if len(informative) < 2:
+            continue
+        # View each band as one opaque value so rows can be sorted and compared at once
+        keys = np.ascontiguousarray(values[informative]).view(np.dtype((np.void, band_width)))[:, 0]
+        order = informative[np.argsort(keys, kind='stable')]
+        sorted_keys = np.sort(keys, kind='stable')
+        run_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        run_ends = np.concatenate((run_starts[1:], [len(sorted_keys)]))
+        shared = run_ends - run_starts > 1
+        for start, end in zip(run_starts[shared], run_ends[shared]):
+            bucket = np.sort(order[start:end])
+            for position in range(len(bucket) - 1):
+                i = bucket[position]
+                others = bucket[position + 1:]
+                distances = hamming_distances(fingerprints[others], fingerprints[i])
+                close = distances <= max_distance
+                for j, distance in zip(others[close], distances[close]):
+                    pairs[(int(i), int(j))] = int(distance)
+    return pairs
+
+def _group_pairs(count, pairs):
+    """Union-find over near-duplicate pairs; returns lists of member indices with at least two members."""
+    parent = list(range(count))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = root(i), root(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(root(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+def _split_group(members, sizes, fingerprints, max_distance):
+    """
+    Splits a union-find group into keepers and the duplicates within max_distance of each.
+
+    Pairs are chained transitively, so a group can hold chunks that are far
+    apart (A close to B, B close to C, A not close to C). The largest remaining
+    member is kept, only members within max_distance bits of it become its
+    duplicates, and the rest are split again the same way.
+
+    Args:
+        members (list): Member indices into fingerprints, in path order.
+        sizes (list): File size of each member; ties keep the earlier member.
+        fingerprints (numpy.ndarray): uint8 array of shape (n, FINGERPRINT_BITS // 8).
+        max_distance (int): Maximum Hamming distance of a duplicate from its keeper.
+
+    Returns:
+        list: (keep, [(index, distance in bits), ...]) for every keeper that has duplicates.
+    """
+    remaining = sorted(range(len(members)), key=lambda position: -sizes[position])
+    splits = []
+    while len(remaining) > 1:
+        keep = members[remaining[0]]
+        others = [members[position] for position in remaining[1:]]
+        distances = hamming_distances(fingerprints[others], fingerprints[keep])
+        duplicates = [(i, int(distance)) for i, distance in zip(others, distances) if distance <= max_distance]
+        if duplicates:
+            splits.append((keep, duplicates))
+        remaining = [position for position, distance in zip(remaining[1:], distances) if distance > max_distance]
+    return splits
+
+def find_duplicate_chunks(
+    directory_path,
+    supported_formats=None,
+    max_distance=0.05,
+    bands=16,
+    remove=False,
+    use_index=True,
+    index_path=None,
+    workers=1,
+    metrics_path=None,
+    quiet=False
+):
+    """
+    Finds (and optionally deletes) near-duplicate chunks in a directory.
+
+    Each chunk gets a compact spectral fingerprint (see compute_fingerprint),
+    which is cached in the directory's utils.audio_index.AudioIndex. Near
+    duplicates are then found with banded locality-sensitive hashing (see
+    find_near_duplicates) instead of comparing every pair. Typical hits are
+    the same phrase split from a studio album and from a "best of" release,
+    or a repeated chorus.
+
+    Args:
+        directory_path (str): The directory of split chunks to scan.
+        supported_formats (list, optional): Audio file extensions to consider.
+        max_distance (float): Maximum share of differing fingerprint bits
+                              (0.0-1.0) for two chunks to count as duplicates.
+                              Default is 0.05; unrelated chunks differ in
+                              roughly a quarter to a half of their bits.
+        bands (int): Number of LSH bands (1, 2, 4, 8, 16, 32 or 64).
+        remove (bool): If True, delete every duplicate except the largest (longest)
+                       chunk of each group; ties go to the first path in sort order.
+                       Only chunks within max_distance of the kept chunk count
+                       as its duplicates (see _split_group).
+                       Otherwise only report them. Deleted chunks are also removed
+                       from the directory's chunk list, if it has one.
+        use_index (bool): If True (default), cache fingerprints in an AudioIndex
+                          so later runs only fingerprint new or changed chunks.
+        index_path (str, optional): Location of the index file. Defaults to
+                                    a hidden SQLite file inside directory_path.
+        workers (int): Number of worker processes used to fingerprint chunks.
+        metrics_path (str, optional): If given, write per-file outcomes and stage
+                                      timings to this JSON lines file.
+        quiet (bool): If True, drop the per-group report lines.
+
+    Returns:
+        list: One dict per duplicate group with 'keep' (the path kept) and
+              'duplicates' (list of (path, distance in bits from the kept chunk)).
+    """
+    if supported_formats is None:
+        supported_formats = ["mp3", "wav", "flac", "ogg", "aac", "m4a"]
+
+    print(f"\n--- Finding Duplicate Chunks ---")
+    print(f"Scanning directory: {directory_path}")
+    if not os.path.isdir(directory_path):
+        print(f"Error: Directory '{directory_path}' not found.")
+        return []
+    fingerprint_bytes = FINGERPRINT_BITS // 8
+    if bands < 1 or fingerprint_bytes % bands:
+        print(f"Warning: {bands} bands do not divide a {fingerprint_bytes}-byte fingerprint. Defaulting to 16.")
+        bands = 16
+
+    filepaths = sorted(list_audio_files(directory_path, supported_formats))
+
+    groups = []
+    with RunMetrics("dedup", metrics_path, quiet) as metrics:
+        index = AudioIndex(directory_path, index_path) if use_index else None
+        try:
+            fingerprints = {}
+            pending = []
+            for filepath in filepaths:
+                found, fingerprint = (False, None) if index is None else index.lookup_fingerprint(
+                    filepath, FINGERPRINT_VERSION
+                )
+                if found:
+                    fingerprints[filepath] = fingerprint
+                    metrics.file_done(filepath, 'cached')
+                else:
+                    pending.append(filepath)
+
+            print(f"Fingerprinting {len(pending)} new or changed chunks ({len(fingerprints)} cached)")
+            if workers is not None and workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = executor.map(_fingerprint_file, pending, chunksize=16)
+                    outcomes = list(zip(pending, results))
+            else:
+                outcomes = ((filepath, _fingerprint_file(filepath)) for filepath in pending)
+
+            for filepath, (fingerprint, stages, error) in outcomes:
+                if error is not None:
+                    print(f"Warning: Could not fingerprint {filepath}: {error}")
+                    metrics.file_done(filepath, 'error', stages, error=error)
+                    continue
+                fingerprints[filepath] = fingerprint
+                with capture_stages() as index_stages:
+                    if index is not None:
+                        index.store_fingerprint(filepath, FINGERPRINT_VERSION, fingerprint)
+                metrics.file_done(filepath, 'fingerprinted' if fingerprint else 'silent',
+                                  merge_stages(stages, index_stages))
+
+            usable = [filepath for filepath in filepaths if fingerprints.get(filepath)]
+            matrix = np.frombuffer(b"".join(fingerprints[filepath] for filepath in usable), dtype=np.uint8)
+            matrix = matrix.reshape(len(usable), fingerprint_bytes)
+            max_bits = int(max_distance * FINGERPRINT_BITS)
+            pairs = find_near_duplicates(matrix, max_bits, bands)
+
+            for members in _group_pairs(len(usable), pairs):
+                # Keep the longest chunk; members are in path order, so ties keep the first
+                sizes = [os.path.getsize(usable[i]) for i in members]
+                for keep, duplicates in _split_group(members, sizes, matrix, max_bits):
+                    groups.append({
+                        'keep': usable[keep],
+                        'duplicates': [(usable[i], distance) for i, distance in duplicates],
+                    })
+
+            deleted_count = 0
+            deleted_filepaths = []
+            for group in groups:
+                log(f"  KEEP: {group['keep']}")
+                for path, distance in group['duplicates']:
+                    if remove:
+                        try:
+                            os.remove(path)
+                            if index is not None:
+                                index.remove(path)
+                            deleted_count += 1
+                            deleted_filepaths.append(path)
+                            log(f"    DELETED: {path} ({distance} bits differ)")
+                        except OSError as e:
+                            print(f"    Error deleting {path}: {e}")
+                    else:
+                        log(f"    DUPLICATE: {path} ({distance} bits differ)")
+            remove_from_chunk_list(directory_path, deleted_filepaths)
+        finally:
+            if index is not None:
+                index.prune()
+                index.close()
+
+    duplicate_count = sum(len(group['duplicates']) for group in groups)
+    print(f"\n--- Deduplication Summary ---")
+    print(f"Total chunks: {len(filepaths)}, duplicate groups: {len(groups)}, duplicates: {duplicate_count}")
+    if remove:
+        print(f"Total files deleted: {deleted_count}")
+    metrics.print_summary()
+
+    return groups
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Find near-duplicate chunks by spectral fingerprint.")
+    parser.add_argument("directory", help="Directory of split chunks")
+    parser.add_argument("--max-distance", type=float, default=0.05,
+                        help="Maximum share of differing fingerprint bits (0-1)")
+    parser.add_argument("--bands", type=int, default=16, help="Number of LSH bands")
+    parser.add_argument("--remove", action="store_true", help="Delete duplicates instead of only reporting them")
+    parser.add_argument("--no-index", action="store_true", help="Do not cache fingerprints")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--metrics", help="Write per-file outcomes and stage timings to this JSON lines file")
+    parser.add_argument("--quiet", action="store_true", help="Do not print every duplicate")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    find_duplicate_chunks(
+        args.directory,
+        max_distance=args.max_distance,
+        bands=args.bands,
+        remove=args.remove,
+        use_index=not args.no_index,
+        workers=args.workers,
+        metrics_path=args.metrics,
+        quiet=args.quiet
+    )
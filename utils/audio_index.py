@@ -0,0 +1,212 @@
+import os
+import sqlite3
+from utils.instrumentation import timed
+
+# Default file name of the index, created at the root of the scanned dataset directory.
+DEFAULT_INDEX_FILENAME = ".audio_index.sqlite"
+
+# Pending writes are committed after this many stores, so an interrupted
+# first pass over a large dataset keeps most of what it measured.
+COMMIT_INTERVAL = 100
+
+# Columns stored per file besides the path/size/mtime key, with their SQLite types.
+# These mirror the record returned by utils.audio_utils.analyze_audio.
+ANALYSIS_COLUMNS = [
+    ("duration", "REAL"),
+    ("dbfs", "REAL"),
+    ("gated_dbfs", "REAL"),
+    ("sample_rate", "INTEGER"),
+    ("channels", "INTEGER"),
+    ("peak", "REAL"),
+    ("rms", "REAL"),
+    ("clipping_ratio", "REAL"),
+    ("silence_fraction", "REAL"),
+    ("silence_thresh", "REAL"),
+    ("level_histogram", "BLOB"),
+]
+ANALYSIS_FIELDS = [name for name, _ in ANALYSIS_COLUMNS]
+
+class AudioIndex:
+    """
+    An on-disk SQLite cache of per-file analysis results for a dataset directory.
+
+    Entries are keyed by the path relative to the dataset root and are only
+    returned while the file's size and mtime still match what was recorded, so
+    new or changed files are transparently re-analysed and everything else is
+    served from the index.
+
+    Writes are committed every COMMIT_INTERVAL stores and on close(). Use it
+    as a context manager so the last pending writes are committed on exit:
+
+        with AudioIndex("path/to/split_audio_output") as index:
+            row = index.lookup(filepath)
+    """
+
+    def __init__(self, directory_path, index_path=None):
+        """
+        Args:
+            directory_path (str): The dataset directory the index describes.
+            index_path (str, optional): Where to store the SQLite file.
+                                        Defaults to DEFAULT_INDEX_FILENAME
+                                        inside directory_path.
+        """
+        self.root = os.path.abspath(directory_path)
+        if index_path is None:
+            index_path = os.path.join(self.root, DEFAULT_INDEX_FILENAME)
+        self.index_path = index_path
+        self.pending_writes = 0
+        self.connection = sqlite3.connect(index_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL"
+            ")"
+        )
+        # Add any analysis columns missing from an index written by an older version
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(files)")}
+        for name, column_type in ANALYSIS_COLUMNS:
+            if name not in existing:
+                self.connection.execute(f"ALTER TABLE files ADD COLUMN {name} {column_type}")
+        # Spectral fingerprints (utils.audio_dedup) live in their own table so that
+        # a missing fingerprint never makes an analysis record look incomplete
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " fingerprint BLOB"
+            ")"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Commits pending writes and closes the database."""
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def _wrote(self):
+        """Counts a write and commits once COMMIT_INTERVAL writes are pending."""
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def _key(self, filepath):
+        return os.path.relpath(os.path.abspath(filepath), self.root)
+
+    @timed("index")
+    def lookup(self, filepath):
+        """
+        Returns the cached analysis of a file if it is still up to date.
+
+        Args:
+            filepath (str): The path to the audio file.
+
+        Returns:
+            dict or None: The stored fields (see ANALYSIS_FIELDS; unknown ones are None),
+                          or None if the file is not indexed or has changed since.
+        """
+        return self._lookup(filepath)
+
+    def _lookup(self, filepath):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        row = self.connection.execute(
+            f"SELECT size, mtime_ns, {', '.join(ANALYSIS_FIELDS)} FROM files WHERE path = ?",
+            (self._key(filepath),)
+        ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None
+        return dict(zip(ANALYSIS_FIELDS, row[2:]))
+
+    @timed("index")
+    def store(self, filepath, **fields):
+        """
+        Records analysis results for a file under its current size and mtime.
+
+        Fields already stored for an unchanged file are kept unless overwritten,
+        so a duration-only pass does not discard a previously measured dBFS.
+
+        Args:
+            filepath (str): The path to the audio file.
+            **fields: Any of ANALYSIS_FIELDS.
+        """
+        stat = os.stat(filepath)
+        merged = self._lookup(filepath) or dict.fromkeys(ANALYSIS_FIELDS)
+        merged.update({name: value for name, value in fields.items() if name in ANALYSIS_FIELDS})
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO files (path, size, mtime_ns, {', '.join(ANALYSIS_FIELDS)})"
+            f" VALUES ({', '.join('?' * (len(ANALYSIS_FIELDS) + 3))})",
+            (self._key(filepath), stat.st_size, stat.st_mtime_ns,
+             *(merged[name] for name in ANALYSIS_FIELDS))
+        )
+        self._wrote()
+
+    @timed("index")
+    def lookup_fingerprint(self, filepath, version):
+        """
+        Returns the cached fingerprint of a file if it is still up to date.
+
+        Args:
+            filepath (str): The path to the audio file.
+            version (int): The fingerprint version the caller computes; entries
+                           written by another version are ignored.
+
+        Returns:
+            tuple: (found, fingerprint) where fingerprint is bytes, or None if the
+                   file was fingerprinted but has no usable signal (e.g. silence).
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False, None
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, version, fingerprint FROM fingerprints WHERE path = ?",
+            (self._key(filepath),)
+        ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns or row[2] != version:
+            return False, None
+        return True, row[3]
+
+    @timed("index")
+    def store_fingerprint(self, filepath, version, fingerprint):
+        """Records a file's fingerprint (bytes, or None for no usable signal)."""
+        stat = os.stat(filepath)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, version, fingerprint) VALUES (?, ?, ?, ?, ?)",
+            (self._key(filepath), stat.st_size, stat.st_mtime_ns, version, fingerprint)
+        )
+        self._wrote()
+
+    def remove(self, filepath):
+        """Drops the entries for a file, e.g. after it has been deleted."""
+        self.connection.execute("DELETE FROM files WHERE path = ?", (self._key(filepath),))
+        self.connection.execute("DELETE FROM fingerprints WHERE path = ?", (self._key(filepath),))
+
+    def prune(self):
+        """
+        Removes entries whose files no longer exist.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        removed_count = 0
+        for table in ("files", "fingerprints"):
+            stale = [
+                (path,) for (path,) in self.connection.execute(f"SELECT path FROM {table}")
+                if not os.path.exists(os.path.join(self.root, path))
+            ]
+            self.connection.executemany(f"DELETE FROM {table} WHERE path = ?", stale)
+            removed_count += len(stale)
+        return removed_count
@@ -4,9 +4,12 @@ import os
 # and the main functions now rely on audio_utils.
 
 # Import functions from audio_utils
-from utils.audio_utils import is_supported_audio_file, get_file_duration, format_duration
+from utils.audio_utils import list_audio_files, get_file_duration, format_duration
+from utils.audio_index import AudioIndex
+from utils.instrumentation import RunMetrics, capture_stages, log
 
-def get_audio_total_length(directory_path, supported_formats=None):
+def get_audio_total_length(directory_path, supported_formats=None, use_index=True, index_path=None,
+                           metrics_path=None, quiet=False):
     """
     Calculates the total length of all supported audio files in a given directory
     and its subdirectories using functions from audio_utils.
@@ -16,6 +19,15 @@ def get_audio_total_length(directory_path, supported_formats=None):
         supported_formats (list, optional): A list of audio file extensions
                                             to consider (e.g., ["mp3", "wav", "flac"]).
                                             If None, a default list of common formats is used.
+        use_index (bool): If True (default), cache per-file results in an
+                          utils.audio_index.AudioIndex so that later runs only
+                          analyse new or changed files.
+        index_path (str, optional): Location of the index file. Defaults to
+                                    a hidden SQLite file inside directory_path.
+        metrics_path (str, optional): If given, write per-file outcomes and
+                                      probe/decode timings to this JSON lines
+                                      file (see utils.instrumentation.RunMetrics).
+        quiet (bool): If True, drop the per-file "Processed" lines.
 
     Returns:
         float: The total duration of all audio files in seconds.
@@ -35,26 +47,34 @@ def get_audio_total_length(directory_path, supported_formats=None):
         print(f"Error: Directory '{directory_path}' not found.")
         return 0.0
 
-    for root, _, files in os.walk(directory_path):
-        for filename in files:
-            if is_supported_audio_file(filename, supported_formats):
-                filepath = os.path.join(root, filename)
-                duration_seconds = get_file_duration(filepath) # file_extension is handled by get_file_duration
+    with RunMetrics("length", metrics_path, quiet) as metrics:
+        index = AudioIndex(directory_path, index_path) if use_index else None
+        try:
+            for filepath in list_audio_files(directory_path, supported_formats):
+                filename = os.path.basename(filepath)
+                with capture_stages() as stages:
+                    duration_seconds = get_file_duration(filepath, index=index) # file_extension is handled by get_file_duration
 
                 if duration_seconds is not None:
                     total_duration_seconds += duration_seconds
                     processed_files_count += 1
                     # Individual file processing messages are now in get_file_duration or can be added here if needed
-                    print(f"  Processed: {filename} ({duration_seconds:.2f}s)")
+                    log(f"  Processed: {filename} ({duration_seconds:.2f}s)")
+                    metrics.file_done(filepath, 'processed', stages, duration=duration_seconds)
                 else:
                     # get_file_duration already prints a warning for decoding/other errors
-                    print(f"  Skipped: {filename} (error during processing)")
+                    log(f"  Skipped: {filename} (error during processing)")
                     skipped_files_count += 1
-            # Files not in supported_formats are silently skipped by is_supported_audio_file
+                    metrics.file_done(filepath, 'skipped', stages)
+        finally:
+            if index is not None:
+                index.prune()
+                index.close()
 
     print(f"\n--- Summary ---")
     print(f"Total files processed: {processed_files_count}")
     print(f"Total files skipped: {skipped_files_count}")
+    metrics.print_summary()
 
     return total_duration_seconds
 
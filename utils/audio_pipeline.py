@@ -0,0 +1,233 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.audio_utils import (
+    is_supported_audio_file,
+    load_audio_array,
+    resample_audio,
+    compute_audio_metrics,
+    gate_audio_record,
+    find_segment_boundaries,
+    export_audio_array,
+    generate_chunk_filename,
+    GATING_MODES
+)
+
+# so-vits-svc trains on 44.1 kHz mono 16-bit WAV (the output of its resample.py).
+TARGET_SAMPLE_RATE = 44100
+
+def _prepare_single_file(
+    original_filepath,
+    output_directory,
+    target_sample_rate,
+    segmentation,
+    segment_duration_ms,
+    segment_options,
+    naming_convention,
+    loudness_threshold_dbfs,
+    gating,
+    min_voiced_fraction,
+    normalize
+):
+    """
+    Decodes one source, turns it into training-ready chunks and exports the survivors.
+
+    Returns:
+        dict: A per-file summary with keys 'source', 'status' ('ok' or 'error'),
+              'chunks' (list of exported filenames), 'dropped' (number of chunks
+              rejected by the loudness gate) and 'error' (str or None).
+    """
+    filename = os.path.basename(original_filepath)
+    result = {'source': original_filepath, 'status': 'ok', 'chunks': [], 'dropped': 0, 'error': None}
+
+    try:
+        samples, sample_rate = load_audio_array(original_filepath)
+        samples = resample_audio(samples.mean(axis=1, keepdims=True), sample_rate, target_sample_rate)
+
+        if segmentation == "silence":
+            boundaries = find_segment_boundaries(samples, target_sample_rate, **segment_options)
+        else:
+            segment_frames = target_sample_rate * segment_duration_ms // 1000
+            boundaries = [
+                (start, min(start + segment_frames, len(samples)))
+                for start in range(0, len(samples), segment_frames)
+            ]
+
+        for i, (start, end) in enumerate(boundaries):
+            chunk = samples[start:end]
+            record = compute_audio_metrics(chunk, target_sample_rate)
+            keep, _ = gate_audio_record(record, loudness_threshold_dbfs, gating, min_voiced_fraction)
+            if not keep:
+                result['dropped'] += 1
+                continue
+
+            if normalize and record['peak'] > 0:
+                # Scale the peak to full scale; no trimming or headroom as in so-vits-svc resample.py
+                chunk = chunk / record['peak']
+
+            output_filename = generate_chunk_filename(
+                original_filepath=original_filepath,
+                segment_index=i,
+                naming_convention=naming_convention,
+                audio_format="wav",
+                original_filename=filename
+            )
+            export_audio_array(chunk, target_sample_rate, os.path.join(output_directory, output_filename), "wav")
+            result['chunks'].append(output_filename)
+
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+
+    return result
+
+def prepare_training_chunks(
+    input_directory,
+    output_directory,
+    supported_formats=None,
+    target_sample_rate=TARGET_SAMPLE_RATE,
+    segmentation="silence",  # "fixed" or "silence"
+    segment_duration_ms=5000,
+    min_segment_ms=5000,
+    max_segment_ms=10000,
+    silence_thresh=-40.0,
+    naming_convention="hash",
+    loudness_threshold_dbfs=-30.0,
+    gating="dbfs",
+    min_voiced_fraction=0.5,
+    normalize=True,
+    workers=1
+):
+    """
+    Runs split, clean and resample as one pass over a directory of vocal tracks.
+
+    Each source is decoded once. In memory it is downmixed to mono, resampled
+    to target_sample_rate, segmented and loudness-gated, and only the chunks
+    that pass are written, as 16-bit mono WAV. This replaces running
+    split_audio_files, delete_low_loudness_audio_files and so-vits-svc's
+    resample.py one after the other. The output is in the format
+    so-vits-svc's dataset/44k/<speaker> directory expects, but is not
+    trimmed or scaled the way resample.py does it.
+
+    Args:
+        input_directory (str): The directory of source audio to walk through.
+        output_directory (str): Where the training chunks are written.
+        supported_formats (list, optional): Source file extensions to process.
+        target_sample_rate (int): Output sample rate. Default is 44100.
+        segmentation (str): "silence" (default) or "fixed"; see
+                            audio_split.split_audio_files.
+        segment_duration_ms (int): Chunk length in "fixed" mode.
+        min_segment_ms (int): Minimum length of the pieces a long phrase is cut into in "silence" mode.
+        max_segment_ms (int): Maximum chunk length in "silence" mode.
+        silence_thresh (float): Silence threshold in dBFS for "silence" mode.
+        naming_convention (str): See audio_utils.generate_chunk_filename.
+        loudness_threshold_dbfs (float): Chunks below this are not exported.
+        gating (str): "dbfs", "gated" or "voiced"; see audio_utils.gate_audio_record.
+        min_voiced_fraction (float): Minimum share of voiced frames for "voiced" gating.
+        normalize (bool): If True (default), scale each exported chunk so its
+                          peak is at full scale. so-vits-svc resample.py
+                          also trims silence and leaves headroom, so the
+                          output is not identical to its output.
+        workers (int): Number of worker processes; each handles whole source files.
+
+    Returns:
+        list: One summary dict per source file (see _prepare_single_file), in
+              the order the files were discovered.
+    """
+    if supported_formats is None:
+        supported_formats = ["mp3", "wav", "flac", "ogg", "aac", "m4a"]
+    if gating not in GATING_MODES:
+        print(f"Warning: Invalid gating '{gating}'. Defaulting to 'dbfs'.")
+        gating = "dbfs"
+
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+        print(f"Created output directory: {output_directory}")
+
+    source_files = []
+    for root, _, files in os.walk(input_directory):
+        for filename in files:
+            if is_supported_audio_file(filename, supported_formats):
+                source_files.append(os.path.join(root, filename))
+
+    job_args = (
+        output_directory, target_sample_rate, segmentation, segment_duration_ms,
+        {'min_segment_ms': min_segment_ms, 'max_segment_ms': max_segment_ms, 'silence_thresh': silence_thresh},
+        naming_convention, loudness_threshold_dbfs, gating, min_voiced_fraction, normalize
+    )
+
+    print(f"Preparing {len(source_files)} files at {target_sample_rate} Hz mono "
+          f"({segmentation} segmentation, {gating} gating at {loudness_threshold_dbfs} dBFS)")
+
+    if workers is None or workers <= 1:
+        results = []
+        for original_filepath in source_files:
+            print(f"Processing: {original_filepath}")
+            results.append(_prepare_single_file(original_filepath, *job_args))
+    else:
+        results_by_source = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_prepare_single_file, original_filepath, *job_args): original_filepath
+                for original_filepath in source_files
+            }
+            for future in as_completed(futures):
+                original_filepath = futures[future]
+                try:
+                    results_by_source[original_filepath] = future.result()
+                except Exception as e:
+                    results_by_source[original_filepath] = {
+                        'source': original_filepath, 'status': 'error', 'chunks': [], 'dropped': 0, 'error': str(e)
+                    }
+        results = [results_by_source[path] for path in source_files]
+
+    print(f"\n--- Preparation Summary ---")
+    for result in results:
+        if result['status'] == 'ok':
+            print(f"  OK: {result['source']} ({len(result['chunks'])} kept, {result['dropped']} dropped)")
+        else:
+            print(f"  ERROR: {result['source']} ({result['error']})")
+    kept_count = sum(len(result['chunks']) for result in results)
+    dropped_count = sum(result['dropped'] for result in results)
+    failed_count = sum(1 for result in results if result['status'] == 'error')
+    print(f"Total files: {len(results)}, failed: {failed_count}, "
+          f"chunks exported: {kept_count}, chunks dropped: {dropped_count}")
+
+    return results
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Split, clean and resample vocals into training-ready chunks.")
+    parser.add_argument("input_dir", help="Directory of separated vocal tracks")
+    parser.add_argument("output_dir", help="Output directory, e.g. so-vits-svc/dataset/44k/<speaker>")
+    parser.add_argument("--sample-rate", type=int, default=TARGET_SAMPLE_RATE, help="Target sample rate")
+    parser.add_argument("--segmentation", default="silence", choices=["fixed", "silence"])
+    parser.add_argument("--segment-ms", type=int, default=5000, help="Chunk length in fixed mode")
+    parser.add_argument("--min-segment-ms", type=int, default=5000)
+    parser.add_argument("--max-segment-ms", type=int, default=10000)
+    parser.add_argument("--silence-thresh", type=float, default=-40.0)
+    parser.add_argument("--naming", default="hash", choices=["hash", "indexed"])
+    parser.add_argument("--threshold", type=float, default=-30.0, help="Loudness threshold in dBFS")
+    parser.add_argument("--gating", default="dbfs", choices=GATING_MODES)
+    parser.add_argument("--min-voiced-fraction", type=float, default=0.5)
+    parser.add_argument("--no-normalize", action="store_true", help="Do not peak-normalise chunks")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    prepare_training_chunks(
+        input_directory=args.input_dir,
+        output_directory=args.output_dir,
+        target_sample_rate=args.sample_rate,
+        segmentation=args.segmentation,
+        segment_duration_ms=args.segment_ms,
+        min_segment_ms=args.min_segment_ms,
+        max_segment_ms=args.max_segment_ms,
+        silence_thresh=args.silence_thresh,
+        naming_convention=args.naming,
+        loudness_threshold_dbfs=args.threshold,
+        gating=args.gating,
+        min_voiced_fraction=args.min_voiced_fraction,
+        normalize=not args.no_normalize,
+        workers=args.workers
+    )
@@ -0,0 +1,481 @@
+import os
+import argparse
+import itertools
+from math import gcd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.audio_utils import (
+    GATING_BLOCK_MS,
+    iter_audio_blocks,
+    resample_audio,
+    gate_block_powers,
+    export_audio_array,
+    is_supported_audio_file,
+    amplitude_to_dbfs,
+    format_duration
+)
+from utils.instrumentation import RunMetrics, capture_stages, stage, log
+
+try:
+    import soundfile as sf
+except ImportError:  # Mixes are then collected in memory and written by export_audio_array
+    sf = None
+
+# Limiter. Peaks are measured per LIMITER_FRAME_MS frame; the gain needed to
+# keep a frame under the ceiling is held for 2 * LIMITER_RELEASE_FRAMES frames
+# on either side and then averaged over LIMITER_RELEASE_FRAMES frames, so the
+# gain starts falling before a peak (look-ahead) and recovers smoothly after it.
+LIMITER_FRAME_MS = 5
+LIMITER_RELEASE_FRAMES = 4
+
+# Formats the mix can be written in block by block (via soundfile)
+STREAMING_FORMATS = ["wav", "flac", "ogg"]
+
+def _rebuffer(blocks, block_frames):
+    """Regroups a stream of (frames, channels) arrays into arrays of exactly block_frames frames (the last may be shorter)."""
+    pending = []
+    pending_frames = 0
+    for block in blocks:
+        pending.append(block)
+        pending_frames += len(block)
+        if pending_frames < block_frames:
+            continue
+        joined = np.concatenate(pending) if len(pending) > 1 else pending[0]
+        usable = len(joined) - len(joined) % block_frames
+        for start in range(0, usable, block_frames):
+            yield joined[start:start + block_frames]
+        pending = [joined[usable:]]
+        pending_frames = len(joined) - usable
+    if pending_frames:
+        yield np.concatenate(pending)
+
+def _resample_blocks(blocks, sample_rate, target_sample_rate):
+    """
+    Resamples a block stream, giving the same samples as resampling the whole signal at once.
+
+    Each block is resampled together with enough neighbouring input to cover
+    the polyphase filter, and only the output belonging to the block itself is
+    kept. Blocks start at multiples of the resampling ratio's denominator so
+    that their output lines up exactly with the whole-signal output.
+    """
+    if sample_rate == target_sample_rate:
+        yield from blocks
+        return
+    divisor = gcd(sample_rate, target_sample_rate)
+    up, down = target_sample_rate // divisor, sample_rate // divisor
+    # resample_poly's filter reaches 10 * max(up, down) upsampled samples to either side
+    context = down * -(-(10 * max(up, down) // up + 1) // down)
+    block_frames = down * max(1, sample_rate // down)
+
+    stream = _rebuffer(blocks, block_frames)
+    current = next(stream, None)
+    left = None
+    while current is not None:
+        following = next(stream, None)
+        if left is None:
+            left = current[:0]
+        right = following[:context] if following is not None else current[:0]
+        with stage("mix"):
+            resampled = resample_audio(np.concatenate([left, current, right]), sample_rate, target_sample_rate)
+            start = len(left) * up // down
+            if following is not None:
+                yield resampled[start:start + len(current) * up // down]
+            else:
+                yield resampled[start:]
+            left = np.concatenate([left, current])[-context:]
+        current = following
+
+def _limit_blocks(blocks, sample_rate, ceiling_dbfs, stats):
+    """
+    Applies a look-ahead peak limiter to a block stream.
+
+    Blocks must be whole multiples of the limiter frame (except the last).
+    Output is delayed by one block, which is the look-ahead. The largest gain
+    reduction, in dB, is stored in stats['peak_reduction_db'].
+    """
+    frame_length = max(1, sample_rate * LIMITER_FRAME_MS // 1000)
+    release = LIMITER_RELEASE_FRAMES
+    hold = 2 * release
+    context = hold + release + 1
+    ceiling = 10 ** (ceiling_dbfs / 20)
+    stats.setdefault('peak_reduction_db', 0.0)
+
+    def required_gains(block):
+        frame_count = -(-len(block) // frame_length)
+        peaks = np.zeros(frame_count * frame_length, dtype=np.float32)
+        peaks[:len(block)] = np.abs(block).max(axis=1)
+        peaks = peaks.reshape(frame_count, frame_length).max(axis=1)
+        return np.minimum(1.0, ceiling / np.maximum(peaks, 1e-9))
+
+    history = np.ones(context)
+    pending, pending_gains = None, None
+    for block in itertools.chain(blocks, [None]):
+        with stage("mix"):
+            gains = required_gains(block) if block is not None else np.ones(0)
+            if pending is not None:
+                lookahead = np.concatenate([gains[:context], np.ones(max(0, context - len(gains)))])
+                extended = np.concatenate([history, pending_gains, lookahead])
+                held = sliding_window_view(extended, 2 * hold + 1).min(axis=1)
+                smoothed = sliding_window_view(held, 2 * release + 1).mean(axis=1)
+                # smoothed[j + 1] is the gain at the start of the pending block's frame j; one
+                # extra value covers the end of its last frame. Every gain used within a frame
+                # is at most the gain that frame needs, so no sample exceeds the ceiling.
+                frame_gains = smoothed[1:len(pending_gains) + 2]
+                sample_gains = np.interp(
+                    np.arange(len(pending)), np.arange(len(frame_gains)) * frame_length, frame_gains
+                )
+                stats['peak_reduction_db'] = max(
+                    stats['peak_reduction_db'], -float(amplitude_to_dbfs(frame_gains.min()))
+                )
+                limited = pending * sample_gains[:, np.newaxis].astype(np.float32)
+                history = np.concatenate([history, pending_gains])[-context:]
+        if pending is not None:
+            yield limited
+        pending, pending_gains = block, gains
+
+def measure_loudness(filepath, file_extension=None):
+    """
+    Measures the gated loudness of a file (see audio_utils.gated_loudness) while streaming it.
+
+    Uses non-overlapping blocks, so the value can differ from gated_loudness
+    by a fraction of a dB.
+
+    Returns:
+        float: The gated loudness in dBFS, or -inf if the file is silent.
+    """
+    block_powers = [
+        float(np.mean(np.square(block, dtype=np.float64)))
+        for block, _ in iter_audio_blocks(filepath, GATING_BLOCK_MS, file_extension)
+        if len(block)
+    ]
+    return gate_block_powers(block_powers)
+
+def _open_stream(filepath, block_ms):
+    """Returns (sample_rate, channels, blocks) for a file, reading only its first block up front."""
+    blocks = iter_audio_blocks(filepath, block_ms)
+    first = next(blocks, None)
+    if first is None:
+        raise ValueError(f"{filepath} contains no audio")
+    samples, sample_rate = first
+    stream = (samples for samples, _ in itertools.chain([first], blocks))
+    return sample_rate, samples.shape[1], stream
+
+def remix_track(
+    vocal_path,
+    accompaniment_path,
+    output_path,
+    reference_vocal_path=None,
+    match_loudness=True,
+    vocal_gain_db=0.0,
+    accompaniment_gain_db=0.0,
+    sample_rate=None,
+    limit=True,
+    ceiling_dbfs=-1.0,
+    block_ms=1000
+):
+    """
+    Mixes converted vocals with an accompaniment stem, block by block.
+
+    Both inputs are streamed (see audio_utils.iter_audio_blocks), resampled to
+    the output rate, mixed and limited in blocks of block_ms, so memory use
+    does not depend on the length of the song. A mono input is spread over
+    every output channel.
+
+    Args:
+        vocal_path (str): The converted vocals (so-vits-svc inference output).
+        accompaniment_path (str): The accompaniment stem from spleeter.
+        output_path (str): Where to write the mix. wav/flac/ogg are written
+                           while mixing; other formats are collected first.
+        reference_vocal_path (str, optional): The original vocal stem. With
+                                              match_loudness, the converted
+                                              vocals are brought to its loudness.
+        match_loudness (bool): If True, match the gated loudness of the converted
+                               vocals to the reference vocals, or to the
+                               accompaniment when no reference is given.
+        vocal_gain_db (float): Extra vocal gain applied after matching.
+        accompaniment_gain_db (float): Gain applied to the accompaniment.
+        sample_rate (int, optional): Output sample rate. Defaults to the accompaniment's.
+        limit (bool): If True, limit peaks to ceiling_dbfs; otherwise overs are clipped.
+        ceiling_dbfs (float): The limiter ceiling. Default is -1.0.
+        block_ms (int): Block length in milliseconds.
+
+    Returns:
+        dict: 'sample_rate', 'channels', 'seconds' (output length),
+              'vocal_gain_db' (total gain applied to the vocals) and
+              'peak_reduction_db' (largest limiter gain reduction, 0.0 if none).
+
+    Raises:
+        CouldntDecodeError: If an input cannot be decoded.
+        ValueError: If an input is empty or the channel layouts cannot be mixed.
+    """
+    applied_vocal_gain_db = vocal_gain_db
+    if match_loudness:
+        vocal_loudness = measure_loudness(vocal_path)
+        target_loudness = measure_loudness(reference_vocal_path or accompaniment_path)
+        if np.isfinite(vocal_loudness) and np.isfinite(target_loudness):
+            applied_vocal_gain_db += target_loudness - vocal_loudness
+        else:
+            print(f"Warning: Skipping loudness matching for {vocal_path} (silent input)")
+
+    vocal_rate, vocal_channels, vocal_blocks = _open_stream(vocal_path, block_ms)
+    accompaniment_rate, accompaniment_channels, accompaniment_blocks = _open_stream(accompaniment_path, block_ms)
+    channels = max(vocal_channels, accompaniment_channels)
+    if min(vocal_channels, accompaniment_channels) not in (1, channels):
+        raise ValueError(f"Cannot mix {vocal_channels}-channel vocals with a "
+                         f"{accompaniment_channels}-channel accompaniment")
+    sample_rate = sample_rate or accompaniment_rate
+
+    frame_length = max(1, sample_rate * LIMITER_FRAME_MS // 1000)
+    block_frames = frame_length * max(1, sample_rate * block_ms // 1000 // frame_length)
+    vocal_blocks = _rebuffer(_resample_blocks(vocal_blocks, vocal_rate, sample_rate), block_frames)
+    accompaniment_blocks = _rebuffer(
+        _resample_blocks(accompaniment_blocks, accompaniment_rate, sample_rate), block_frames
+    )
+    vocal_scale = np.float32(10 ** (applied_vocal_gain_db / 20))
+    accompaniment_scale = np.float32(10 ** (accompaniment_gain_db / 20))
+
+    def mixed_blocks():
+        for vocals, accompaniment in itertools.zip_longest(vocal_blocks, accompaniment_blocks):
+            with stage("mix"):
+                frames = max(len(vocals) if vocals is not None else 0,
+                             len(accompaniment) if accompaniment is not None else 0)
+                mixed = np.zeros((frames, channels), dtype=np.float32)
+                if vocals is not None:
+                    mixed[:len(vocals)] += vocals * vocal_scale
+                if accompaniment is not None:
+                    mixed[:len(accompaniment)] += accompaniment * accompaniment_scale
+            yield mixed
+
+    stats = {}
+    blocks = _limit_blocks(mixed_blocks(), sample_rate, ceiling_dbfs, stats) if limit else mixed_blocks()
+
+    output_format = os.path.splitext(output_path)[1].lower().lstrip('.')
+    temporary_path = f"{output_path}.part"
+    total_frames = 0
+    try:
+        if sf is not None and output_format in STREAMING_FORMATS:
+            subtype = "VORBIS" if output_format == "ogg" else "PCM_16"
+            with sf.SoundFile(temporary_path, 'w', samplerate=sample_rate, channels=channels,
+                              format=output_format.upper(), subtype=subtype) as f:
+                for block in blocks:
+                    with stage("write", block.nbytes):
+                        f.write(np.clip(block, -1.0, 1.0))
+                    total_frames += len(block)
+        else:
+            collected = [np.clip(block, -1.0, 1.0) for block in blocks]
+            samples = np.concatenate(collected) if collected else np.zeros((0, channels), dtype=np.float32)
+            total_frames = len(samples)
+            export_audio_array(samples, sample_rate, temporary_path, output_format)
+        # Only complete mixes appear under the final name, so an interrupted batch redoes this track
+        os.replace(temporary_path, output_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    return {
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'seconds': total_frames / sample_rate,
+        'vocal_gain_db': applied_vocal_gain_db,
+        'peak_reduction_db': stats.get('peak_reduction_db', 0.0),
+    }
+
+def _find_stem(track_directory, stem, supported_formats):
+    for audio_format in supported_formats:
+        path = os.path.join(track_directory, f"{stem}.{audio_format}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def _match_track(vocal_filename, track_names):
+    """
+    Finds the separated track a converted file belongs to.
+
+    so-vits-svc names its output after the input, e.g. "lemon.wav_0key_ashin_sovits_pm.flac"
+    for the vocals of "lemon", so the longest track name the file name starts
+    with (followed by a separator) wins.
+    """
+    stem = os.path.splitext(vocal_filename)[0]
+    matches = [
+        name for name in track_names
+        if stem == name or (stem.startswith(name) and stem[len(name)] in "._- ")
+    ]
+    return max(matches, key=len) if matches else None
+
+def _remix_in_worker(job, options):
+    """Pool task: remixes one track and returns (result, stages, error)."""
+    vocal_path, accompaniment_path, reference_path, output_path = job
+    with capture_stages() as stages:
+        try:
+            result = remix_track(vocal_path, accompaniment_path, output_path,
+                                 reference_vocal_path=reference_path, **options)
+            error = None
+        except Exception as e:
+            result, error = None, str(e)
+    return result, stages, error
+
+def remix_directory(
+    input_path,
+    separated_directory,
+    output_directory,
+    audio_format="wav",
+    supported_formats=None,
+    workers=1,
+    overwrite=False,
+    metrics_path=None,
+    quiet=False,
+    **options
+):
+    """
+    Remixes every converted vocal track of a directory (e.g. an album) with its accompaniment.
+
+    Each converted file is matched to a track of separated_directory (the
+    spleeter output, <track>/accompaniment.wav and <track>/vocals.wav) by
+    name. Tracks separated from subfolders (<album>/<track>) are matched by
+    the track folder's name; if several albums have a track of that name,
+    the one in the converted file's own subfolder is used. Mixes mirror the
+    subfolders of input_path. The original vocal stem, when present, is the
+    loudness reference.
+    Tracks are mixed in parallel with a process pool; mixes that already
+    exist are skipped unless overwrite is True.
+
+    Args:
+        input_path (str): A directory of converted vocals, or a single file.
+        separated_directory (str): The spleeter output directory.
+        output_directory (str): Where the mixes are written, named after the converted files.
+        audio_format (str): Output format. Default is "wav".
+        supported_formats (list, optional): Audio file extensions to consider.
+        workers (int): Number of worker processes.
+        overwrite (bool): If True, remix tracks whose mix already exists.
+        metrics_path (str, optional): If given, write per-file outcomes and stage
+                                      timings to this JSON lines file.
+        quiet (bool): If True, drop the per-track progress lines.
+        **options: Passed on to remix_track (e.g. vocal_gain_db, limit).
+
+    Returns:
+        list: One dict per converted file with 'source', 'accompaniment',
+              'output', 'status' ('mixed', 'skipped', 'unmatched' or 'error'),
+              'result' (remix_track's dict, or None) and 'error'.
+    """
+    if supported_formats is None:
+        supported_formats = ["mp3", "wav", "flac", "ogg", "aac", "m4a"]
+
+    print(f"\n--- Remixing ---")
+    if os.path.isfile(input_path):
+        vocal_files = [input_path]
+    else:
+        vocal_files = []
+        for root, directories, files in os.walk(input_path):
+            directories.sort()
+            for filename in sorted(files):
+                if is_supported_audio_file(filename, supported_formats):
+                    vocal_files.append(os.path.join(root, filename))
+    # Nested inputs are separated into <album>/<track>; match on the track folder's name
+    tracks_by_name = {}
+    for root, directories, _ in os.walk(separated_directory):
+        directories.sort()
+        if root != separated_directory and _find_stem(root, "accompaniment", supported_formats):
+            tracks_by_name.setdefault(os.path.basename(root), []).append(root)
+    os.makedirs(output_directory, exist_ok=True)
+
+    results = []
+    jobs = []
+    for vocal_path in vocal_files:
+        result = {'source': vocal_path, 'accompaniment': None, 'output': None,
+                  'status': 'mixed', 'result': None, 'error': None}
+        results.append(result)
+        relative_directory = "" if vocal_path == input_path else os.path.relpath(os.path.dirname(vocal_path), input_path)
+        track_name = _match_track(os.path.basename(vocal_path), tracks_by_name)
+        candidates = tracks_by_name.get(track_name, [])
+        if len(candidates) > 1:
+            # Same-titled tracks from several folders: take the one in the vocal file's folder
+            candidates = [
+                track_directory for track_directory in candidates
+                if os.path.relpath(os.path.dirname(track_directory), separated_directory) == (relative_directory or ".")
+            ]
+        if len(candidates) != 1:
+            result['status'] = 'unmatched'
+            if track_name is None:
+                print(f"Warning: No accompaniment in {separated_directory} matches {vocal_path}")
+            else:
+                print(f"Warning: Several tracks named '{track_name}' in {separated_directory} match {vocal_path}")
+            continue
+        track_directory = candidates[0]
+        result['accompaniment'] = _find_stem(track_directory, "accompaniment", supported_formats)
+        stem = os.path.splitext(os.path.basename(vocal_path))[0]
+        result['output'] = os.path.join(output_directory, relative_directory, f"{stem}.{audio_format}")
+        if not overwrite and os.path.exists(result['output']):
+            result['status'] = 'skipped'
+            continue
+        os.makedirs(os.path.dirname(result['output']), exist_ok=True)
+        reference_path = _find_stem(track_directory, "vocals", supported_formats)
+        jobs.append((result, (vocal_path, result['accompaniment'], reference_path, result['output'])))
+
+    print(f"Remixing {len(jobs)} tracks ({len(vocal_files) - len(jobs)} skipped or unmatched)")
+    with RunMetrics("remix", metrics_path, quiet) as metrics:
+        if workers is not None and workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(_remix_in_worker, [job for _, job in jobs],
+                                             itertools.repeat(options)))
+        else:
+            outcomes = (_remix_in_worker(job, options) for _, job in jobs)
+
+        for (result, _), (mix, stages, error) in zip(jobs, outcomes):
+            if error is not None:
+                result['status'], result['error'] = 'error', error
+                print(f"  Error remixing {result['source']}: {error}")
+                metrics.file_done(result['source'], 'error', stages, error=error)
+                continue
+            result['result'] = mix
+            log(f"  Mixed: {result['output']} ({format_duration(mix['seconds'])}, "
+                f"vocals {mix['vocal_gain_db']:+.1f} dB, limiter reduction {mix['peak_reduction_db']:.1f} dB)")
+            metrics.file_done(result['source'], 'mixed', stages, output=result['output'],
+                              vocal_gain_db=mix['vocal_gain_db'], peak_reduction_db=mix['peak_reduction_db'])
+        for result in results:
+            if result['status'] in ('skipped', 'unmatched'):
+                metrics.file_done(result['source'], result['status'])
+
+    print(f"\n--- Remix Summary ---")
+    for status in ('mixed', 'skipped', 'unmatched', 'error'):
+        print(f"{status.capitalize()}: {sum(1 for result in results if result['status'] == status)}")
+    metrics.print_summary()
+
+    return results
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Mix converted vocals with their spleeter accompaniment.")
+    parser.add_argument("input_path", help="Converted vocals: a directory (e.g. so-vits-svc results/) or one file")
+    parser.add_argument("separated_directory", help="The spleeter output directory (<track>/accompaniment.wav)")
+    parser.add_argument("-o", "--output", default="remixed", help="Output directory for the mixes")
+    parser.add_argument("-f", "--format", default="wav", help="Output format")
+    parser.add_argument("--vocal-gain", type=float, default=0.0, help="Extra vocal gain in dB after matching")
+    parser.add_argument("--accompaniment-gain", type=float, default=0.0, help="Accompaniment gain in dB")
+    parser.add_argument("--no-match", action="store_true", help="Do not match the vocal loudness")
+    parser.add_argument("--sample-rate", type=int, help="Output sample rate (default: the accompaniment's)")
+    parser.add_argument("--ceiling", type=float, default=-1.0, help="Limiter ceiling in dBFS")
+    parser.add_argument("--no-limit", action="store_true", help="Clip overs instead of limiting")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--overwrite", action="store_true", help="Remix tracks whose mix already exists")
+    parser.add_argument("--metrics", help="Write per-file outcomes and stage timings to this JSON lines file")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line per track")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    remix_directory(
+        args.input_path,
+        args.separated_directory,
+        args.output,
+        audio_format=args.format,
+        workers=args.workers,
+        overwrite=args.overwrite,
+        metrics_path=args.metrics,
+        quiet=args.quiet,
+        match_loudness=not args.no_match,
+        vocal_gain_db=args.vocal_gain,
+        accompaniment_gain_db=args.accompaniment_gain,
+        sample_rate=args.sample_rate,
+        limit=not args.no_limit,
+        ceiling_dbfs=args.ceiling
+    )
@@ -1,15 +1,381 @@
 import os
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 # import hashlib # Removed, as this is now handled by audio_utils.generate_chunk_filename
-from pydub import AudioSegment
+import numpy as np
 from pydub.utils import make_chunks
-from utils.audio_utils import generate_chunk_filename # Added import
+from utils.audio_utils import (
+    generate_chunk_filename,
+    decode_audio,
+    audio_segment_to_array,
+    find_segment_boundaries,
+    iter_audio_blocks,
+    frame_rms,
+    amplitude_to_dbfs,
+    ANALYSIS_FRAME_MS,
+    export_audio_array,
+    export_audio_segment,
+    memmap_wav,
+    pcm_to_float,
+    write_wav_array,
+    shard_chunk_filename,
+    read_chunk_list,
+    write_chunk_list
+)
+from utils.split_manifest import SplitManifest
+from utils.instrumentation import RunMetrics, capture_stages, merge_stages, log
+
+SEGMENTATION_MODES = ["fixed", "silence"]
+
+def _run_export(export, chunk, output_filepath):
+    """Export-thread task: writes one chunk and returns the stages it took."""
+    with capture_stages() as stages:
+        export(chunk, output_filepath)
+    return stages
+
+class ExportQueue:
+    """
+    Encodes and writes chunks on a thread pool while the caller keeps decoding.
+
+    At most max_pending chunks are queued or being written at any time; submit()
+    blocks when the queue is full, so memory stays bounded however far decoding
+    runs ahead. Chunks are grouped by source so each file's outcome can be
+    collected once all of its chunks are written.
+    """
+
+    def __init__(self, threads=2, max_pending=16):
+        """
+        Args:
+            threads (int): Number of export threads.
+            max_pending (int): Maximum number of chunks held by the queue.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.jobs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Waits for the queued chunks and stops the export threads."""
+        self.executor.shutdown(wait=True)
+
+    def submit(self, source, output_filepath, export, chunk, chunk_name=None):
+        """
+        Queues export(chunk, output_filepath), blocking while the queue is full.
+
+        Args:
+            source (str): The source file the chunk belongs to.
+            output_filepath (str): Where the chunk is written.
+            export (callable): Writes a chunk, e.g. audio_utils.export_audio_segment.
+            chunk: The chunk passed to export.
+            chunk_name (str, optional): The name recorded in result['chunks'].
+                                        Defaults to the basename of output_filepath.
+        """
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(_run_export, export, chunk, output_filepath)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.jobs.setdefault(source, []).append(
+            (output_filepath, chunk_name or os.path.basename(output_filepath), future)
+        )
+
+    def collect(self, result, verbose=False):
+        """
+        Waits for every chunk of result['source'] and completes the result in place.
+
+        Written chunks are appended to result['chunks'] in order and their stages
+        added to result['stages']. A failed chunk is reported on its own, the
+        others are kept, and the file's status becomes 'error' so an incremental
+        run splits it again.
+
+        Args:
+            result (dict): The summary returned by _split_single_file.
+            verbose (bool): If True, print a line for every exported chunk.
+        """
+        failed = []
+        for output_filepath, chunk_name, future in self.jobs.pop(result['source'], []):
+            try:
+                result['stages'] = merge_stages(result.get('stages'), future.result())
+            except Exception as e:
+                print(f"  Error exporting {output_filepath}: {e}")
+                failed.append(f"{os.path.basename(output_filepath)}: {e}")
+                continue
+            result['chunks'].append(chunk_name)
+            if verbose:
+                log(f"  Exported: {output_filepath}")
+        if failed:
+            chunk_error = f"{len(failed)} chunks failed to export ({'; '.join(failed)})"
+            result['error'] = f"{result['error']}; {chunk_error}" if result['error'] else chunk_error
+            result['status'] = 'error'
+
+def _make_segments(audio, segmentation, segment_duration_ms, segment_options):
+    """
+    Cuts a decoded AudioSegment into the chunks that will be exported.
+
+    Args:
+        audio (AudioSegment): The decoded source audio.
+        segmentation (str): "fixed" for make_chunks at segment_duration_ms, or
+                            "silence" for find_segment_boundaries.
+        segment_duration_ms (int): Chunk length for "fixed" mode.
+        segment_options (dict): Keyword arguments for find_segment_boundaries.
+
+    Returns:
+        list: AudioSegment chunks, in order.
+    """
+    if segmentation == "silence":
+        boundaries = find_segment_boundaries(
+            audio_segment_to_array(audio), audio.frame_rate, **(segment_options or {})
+        )
+        return [audio.get_sample_slice(start, end) for start, end in boundaries]
+    return make_chunks(audio, segment_duration_ms)
+
+def _slice_mapped_wav(samples, sample_rate, segmentation, segment_duration_ms, segment_options):
+    """
+    Counterpart of _make_segments for a memory-mapped WAV file (see audio_utils.memmap_wav).
+
+    The chunks are views into the mapped file, cut at the same positions as
+    make_chunks / find_segment_boundaries would cut the decoded AudioSegment.
+
+    Returns:
+        list: Sample array views, in order.
+    """
+    if segmentation == "silence":
+        boundaries = find_segment_boundaries(pcm_to_float(samples), sample_rate, **(segment_options or {}))
+    else:
+        # make_chunks works in whole milliseconds of the rounded duration
+        duration_ms = round(len(samples) * 1000 / sample_rate)
+        boundaries = [
+            (int(start_ms * sample_rate / 1000),
+             int(min(start_ms + segment_duration_ms, duration_ms) * sample_rate / 1000))
+            for start_ms in range(0, duration_ms, segment_duration_ms)
+        ]
+    return [samples[start:end] for start, end in boundaries]
+
+# Block size used when streaming a source for silence-aware segmentation.
+STREAM_READ_BLOCK_MS = 1000
+
+def _stream_resume_point(buffer, sample_rate, emitted_end, safe_end, segment_options):
+    """
+    Chooses where the next streaming buffer starts when every chunk found so far was emitted.
+
+    Voiced frames after the last emitted chunk are kept for the next analysis:
+    they may be the start of a phrase that continues in the following blocks.
+    Only voiced stretches followed by more than max_segment_ms of silence
+    (too short for a chunk) and silence are dropped, never more than up to
+    safe_end.
+    """
+    max_samples = sample_rate * segment_options.get('max_segment_ms', 10000) // 1000
+    keep_samples = sample_rate * segment_options.get('keep_silence', 100) // 1000
+    tail = buffer[emitted_end:]
+    mono = tail.mean(axis=1) if tail.ndim > 1 else tail
+    frame_length = max(1, sample_rate * ANALYSIS_FRAME_MS // 1000)
+    levels = amplitude_to_dbfs(frame_rms(mono, frame_length)) if len(mono) else np.zeros(0)
+    voiced = np.flatnonzero(levels >= segment_options.get('silence_thresh', -40.0))
+    if len(voiced) == 0:
+        return max(emitted_end, safe_end)
+    first_voiced = emitted_end + int(voiced[0]) * frame_length
+    last_voiced = emitted_end + (int(voiced[-1]) + 1) * frame_length
+    if len(buffer) - last_voiced > max_samples:
+        return max(emitted_end, safe_end)
+    return max(emitted_end, min(safe_end, max(first_voiced, last_voiced - max_samples) - keep_samples))
+
+def _stream_segments(original_filepath, audio_format, segmentation, segment_duration_ms, segment_options):
+    """
+    Streaming counterpart of _make_segments that never holds the whole source in memory.
+
+    In "fixed" mode every block read from the file is one chunk, so memory is
+    one segment. In "silence" mode a rolling buffer of about three times
+    max_segment_ms is analysed with find_segment_boundaries; chunks that end
+    well before the end of the buffer are emitted and their samples dropped.
+    A chunk still running into the last max_segment_ms is kept whole for the
+    next analysis, as are voiced frames that may start one (see
+    _stream_resume_point), so no phrase is cut short at the buffer edge.
+
+    Yields:
+        tuple: (samples, sample_rate) for each chunk, in order.
+    """
+    if segmentation != "silence":
+        yield from iter_audio_blocks(original_filepath, segment_duration_ms, audio_format)
+        return
+
+    segment_options = segment_options or {}
+    max_segment_ms = segment_options.get('max_segment_ms', 10000)
+    buffer_ms = 3 * max_segment_ms
+    blocks = []
+    buffered_frames = 0
+    sample_rate = None
+
+    for block, sample_rate in iter_audio_blocks(original_filepath, STREAM_READ_BLOCK_MS, audio_format):
+        blocks.append(block)
+        buffered_frames += len(block)
+        if buffered_frames * 1000 < buffer_ms * sample_rate:
+            continue
+
+        buffer = np.concatenate(blocks)
+        # Anything ending within the last max_segment_ms may still grow with the next blocks
+        safe_end = len(buffer) - sample_rate * max_segment_ms // 1000
+        emitted_end = 0
+        pending_start = None
+        for start, end in find_segment_boundaries(buffer, sample_rate, **segment_options):
+            if end > safe_end:
+                pending_start = start
+                break
+            yield buffer[start:end], sample_rate
+            emitted_end = end
+        if pending_start is not None:
+            # The first unfinished chunk is analysed again, whole, together with the next blocks
+            consumed = pending_start
+        else:
+            consumed = _stream_resume_point(buffer, sample_rate, emitted_end, safe_end, segment_options)
+        blocks = [buffer[consumed:]]
+        buffered_frames = len(blocks[0])
+
+    if blocks and sample_rate is not None:
+        buffer = np.concatenate(blocks)
+        for start, end in find_segment_boundaries(buffer, sample_rate, **segment_options):
+            yield buffer[start:end], sample_rate
+
+def _split_single_file(
+    original_filepath,
+    output_directory,
+    audio_format,
+    segment_duration_ms,
+    naming_convention,
+    verbose=True,
+    segmentation="fixed",
+    segment_options=None,
+    streaming=False,
+    source_key=None,
+    shard_depth=0,
+    export_queue=None
+):
+    """
+    Splits one audio file into chunks and exports them to output_directory.
+
+    This is the unit of work handed to each process pool worker, so it must stay
+    a module-level function (picklable) and must not rely on shared state.
+
+    Args:
+        original_filepath (str): The full path to the source audio file.
+        output_directory (str): The directory where chunks are written.
+        audio_format (str): The format of the source and exported chunks.
+        segment_duration_ms (int): The duration of each chunk in milliseconds.
+        naming_convention (str): Passed through to generate_chunk_filename.
+        verbose (bool): If True, print a line for every exported chunk.
+        segmentation (str): "fixed" or "silence"; see split_audio_files.
+        segment_options (dict, optional): Passed to find_segment_boundaries in "silence" mode.
+        streaming (bool): If True, read and export the file block by block
+                          (see _stream_segments) instead of decoding it whole.
+        source_key (str, optional): Passed to generate_chunk_filename for "hash" naming.
+        shard_depth (int): Subdirectory levels for "hash" chunks (see
+                           audio_utils.shard_chunk_filename); 0 writes them flat.
+        export_queue (ExportQueue, optional): If given, chunks are handed to it
+                          instead of being written here, and 'chunks' stays empty
+                          until export_queue.collect(result) is called.
+
+    Returns:
+        dict: A per-file summary with keys 'source', 'status' ('ok' or 'error'),
+              'chunks' (list of exported chunk paths relative to output_directory),
+              'error' (str or None) and
+              'stages' (the file's stage timings, see utils.instrumentation).
+    """
+    filename = os.path.basename(original_filepath)
+    result = {'source': original_filepath, 'status': 'ok', 'chunks': [], 'error': None}
+
+    with capture_stages() as result['stages']:
+        try:
+            # WAV is sliced in place unless streaming must bound memory for silence analysis
+            mapped = None
+            if audio_format == "wav" and not (streaming and segmentation == "silence"):
+                mapped = memmap_wav(original_filepath)
+
+            if mapped is not None:
+                samples, sample_rate = mapped
+                chunks = _slice_mapped_wav(samples, sample_rate, segmentation, segment_duration_ms, segment_options)
+                def export(chunk, output_filepath):
+                    write_wav_array(chunk, sample_rate, output_filepath)
+            elif streaming:
+                chunks = _stream_segments(
+                    original_filepath, audio_format, segmentation, segment_duration_ms, segment_options
+                )
+                def export(chunk, output_filepath):
+                    export_audio_array(chunk[0], chunk[1], output_filepath, audio_format)
+            else:
+                audio = decode_audio(original_filepath, audio_format)
+                chunks = _make_segments(audio, segmentation, segment_duration_ms, segment_options)
+                def export(chunk, output_filepath):
+                    export_audio_segment(chunk, output_filepath, audio_format)
+
+            created_directories = set()
+            for i, chunk in enumerate(chunks):
+                output_filename = generate_chunk_filename(
+                    original_filepath=original_filepath,
+                    segment_index=i,
+                    naming_convention=naming_convention,
+                    audio_format=audio_format,
+                    original_filename=filename,
+                    source_key=source_key
+                )
+                output_filename = shard_chunk_filename(output_filename, shard_depth)
+
+                output_filepath = os.path.join(output_directory, output_filename)
+                shard_directory = os.path.dirname(output_filepath)
+                if shard_depth > 0 and shard_directory not in created_directories:
+                    os.makedirs(shard_directory, exist_ok=True)
+                    created_directories.add(shard_directory)
+                if export_queue is not None:
+                    export_queue.submit(original_filepath, output_filepath, export, chunk, output_filename)
+                    continue
+                export(chunk, output_filepath)
+                result['chunks'].append(output_filename)
+                if verbose:
+                    log(f"  Exported: {output_filepath}")
+
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+
+    return result
+
+def _split_in_worker(*args, export_threads=0, max_pending_chunks=16):
+    """
+    Process pool task: _split_single_file with its own export queue, so the
+    worker encodes and writes chunks while it is still decoding the file.
+    """
+    if export_threads <= 0:
+        return _split_single_file(*args)
+    with ExportQueue(export_threads, max_pending_chunks) as export_queue:
+        result = _split_single_file(*args, export_queue=export_queue)
+        export_queue.collect(result)
+    return result
 
 def split_audio_files(
     input_directory,
     output_directory,
     audio_format="wav",
     segment_duration_ms=5000,  # 5 seconds in milliseconds
-    naming_convention="hash"  # "hash" or "indexed"
+    naming_convention="hash",  # "hash" or "indexed"
+    workers=1,
+    segmentation="fixed",  # "fixed" or "silence"
+    min_segment_ms=5000,
+    max_segment_ms=10000,
+    silence_thresh=-40.0,
+    streaming=False,
+    incremental=False,
+    manifest_path=None,
+    metrics_path=None,
+    quiet=False,
+    export_threads=2,
+    max_pending_chunks=16,
+    shard_depth=0
 ):
     """
     Walks through a directory, reads audio files, and splits them into smaller pieces.
@@ -19,48 +385,252 @@ def split_audio_files(
         input_directory (str): The path to the directory to walk through.
         output_directory (str): The path where the split audio files will be saved.
         audio_format (str): The format of the audio files to process (e.g., "wav", "mp3", "flac").
-                             Default is "wav".
+                             Default is "wav". 8/16/32-bit PCM and float WAV sources
+                             are memory-mapped (audio_utils.memmap_wav) and each
+                             chunk is written as a header plus a slice of the source,
+                             without decoding or re-encoding.
         segment_duration_ms (int): The duration of each audio segment in milliseconds.
                                    Default is 5000ms (5 seconds).
         naming_convention (str): The naming convention for the split files.
                                  Refer to utils.audio_utils.generate_chunk_filename for details.
                                  Default is "hash".
+        workers (int): Number of worker processes. With 1 (default) files are split
+                       sequentially in this process; with more, each source file is
+                       handed to a process pool. Chunk names are identical either way.
+        segmentation (str): "fixed" (default) cuts every segment_duration_ms.
+                            "silence" cuts at pauses so chunks follow the vocal
+                            phrasing and drops the pauses instead of exporting
+                            them. Chunks are at most max_segment_ms; short
+                            phrases stay short (see audio_utils.find_segment_boundaries).
+        min_segment_ms (int): Minimum length of the pieces a long phrase is cut into in "silence" mode.
+        max_segment_ms (int): Maximum chunk length in "silence" mode.
+        silence_thresh (float): RMS level in dBFS below which a frame counts as
+                                silence in "silence" mode.
+        streaming (bool): If True, sources are read block by block and each chunk
+                          is written as soon as its samples are available, so
+                          memory per worker is proportional to the segment
+                          length instead of the file length. Intended for long
+                          recordings such as live albums. flac/ogg chunks
+                          are written as 16-bit PCM (Vorbis for ogg). In
+                          "silence" mode cut points are chosen over a rolling
+                          window and may differ slightly from a full decode.
+        incremental (bool): If True, keep a utils.split_manifest.SplitManifest in the
+                            output directory. Sources are identified by content hash
+                            (which also replaces the path in "hash" chunk names, so
+                            moving the input tree changes nothing); sources already
+                            split with the same parameters are skipped, even if some
+                            of their chunks have since been cleaned away; chunks of
+                            removed or changed sources are deleted, and sources left
+                            unfinished by an interrupted run are split again.
+        manifest_path (str, optional): Location of the manifest. Defaults to a hidden
+                                       JSON file inside output_directory.
+        metrics_path (str, optional): If given, write per-file outcomes and
+                                      decode/segment/encode/write timings to this
+                                      JSON lines file (see utils.instrumentation.RunMetrics).
+        quiet (bool): If True, drop the per-file progress lines; errors and the
+                      totals are still printed.
+        export_threads (int): Threads that encode and write chunks in the
+                              background, so a source's chunks are written while
+                              the next source (or, with streaming, the rest of
+                              the same source) is decoded. 0 writes every chunk
+                              synchronously.
+        max_pending_chunks (int): Maximum number of chunks waiting to be written
+                                  (per worker process). Decoding pauses while the
+                                  queue is full, which bounds memory.
+        shard_depth (int): With "hash" naming, write chunks into shard_depth
+                           levels of subdirectories named after the leading hex
+                           characters of their names ("3f/3fa2....wav" for 1),
+                           so no directory holds more than a few hundred files.
+                           Sharded runs also write a chunk list
+                           (audio_utils.CHUNK_LIST_FILENAME) to output_directory,
+                           from which the clean, length and dedup tools
+                           enumerate chunks instead of walking the tree.
+                           0 (default) writes chunks flat.
+
+    Returns:
+        list: One summary dict per source file (see _split_single_file), in the
+              order the files were discovered. Sources skipped as unchanged have
+              status 'skipped' and list their existing chunks.
     """
 
+    if segmentation not in SEGMENTATION_MODES:
+        print(f"Warning: Invalid segmentation '{segmentation}'. Defaulting to 'fixed'.")
+        segmentation = "fixed"
+    if shard_depth > 0 and naming_convention != "hash":
+        print(f"Warning: Sharding needs 'hash' naming. Writing '{naming_convention}' chunks flat.")
+        shard_depth = 0
+    segment_options = {
+        'min_segment_ms': min_segment_ms,
+        'max_segment_ms': max_segment_ms,
+        'silence_thresh': silence_thresh,
+    }
+
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
         print(f"Created output directory: {output_directory}")
 
-    for root, _, files in os.walk(input_directory):
-        for filename in files:
-            if filename.endswith(f".{audio_format}"):
-                original_filepath = os.path.join(root, filename)
-                print(f"Processing: {original_filepath}")
-
-                try:
-                    audio = AudioSegment.from_file(original_filepath, format=audio_format)
-                    chunks = make_chunks(audio, segment_duration_ms)
-
-                    for i, chunk in enumerate(chunks):
-                        # Replace old naming logic with a call to the utility function
-                        output_filename = generate_chunk_filename(
-                            original_filepath=original_filepath,
-                            segment_index=i,
-                            naming_convention=naming_convention,
-                            audio_format=audio_format,
-                            original_filename=filename
-                        )
-
-                        output_filepath = os.path.join(output_directory, output_filename)
-                        chunk.export(output_filepath, format=audio_format)
-                        print(f"  Exported: {output_filepath}")
-
-                except Exception as e:
-                    print(f"Error processing {original_filepath}: {e}")
+    with RunMetrics("split", metrics_path, quiet) as metrics:
+        source_files = []
+        for root, _, files in os.walk(input_directory):
+            for filename in files:
+                if filename.endswith(f".{audio_format}"):
+                    source_files.append(os.path.join(root, filename))
+
+        results_by_source = {}
+        source_keys = dict.fromkeys(source_files)
+        manifest = None
+        if incremental:
+            manifest = SplitManifest(output_directory, manifest_path)
+            params = {
+                'audio_format': audio_format,
+                'segment_duration_ms': segment_duration_ms,
+                'naming_convention': naming_convention,
+                'segmentation': segmentation,
+                'segment_options': segment_options if segmentation == "silence" else None,
+                'streaming': streaming,
+            }
+            if shard_depth > 0:
+                params['shard_depth'] = shard_depth
+            for original_filepath in source_files:
+                source_keys[original_filepath] = manifest.content_hash(original_filepath)
+            removed_count = manifest.remove_missing(set(source_keys.values()))
+            if removed_count:
+                print(f"Deleted {removed_count} chunks of removed or changed sources")
+
+            claimed = set()
+            for original_filepath in source_files:
+                content_hash = source_keys[original_filepath]
+                if content_hash in claimed or manifest.is_up_to_date(content_hash, params):
+                    # Unchanged, or the same content already queued from another path
+                    results_by_source[original_filepath] = {
+                        'source': original_filepath, 'status': 'skipped',
+                        'chunks': manifest.existing_chunks(content_hash), 'error': None
+                    }
+                    metrics.file_done(original_filepath, 'skipped')
+                else:
+                    manifest.begin(content_hash, original_filepath, params)
+                claimed.add(content_hash)
+            manifest.save()
+
+        def record_result(original_filepath, result):
+            results_by_source[original_filepath] = result
+            metrics.file_done(original_filepath, result['status'], result.pop('stages', None),
+                              chunks=len(result['chunks']), error=result['error'])
+            if manifest is not None:
+                manifest.finish(source_keys[original_filepath], result['chunks'], result['status'] == 'ok')
+
+        pending_files = [path for path in source_files if path not in results_by_source]
+
+        if workers is None or workers <= 1:
+            export_queue = ExportQueue(export_threads, max_pending_chunks) if export_threads > 0 else None
+
+            def finish(result):
+                if export_queue is not None:
+                    export_queue.collect(result, verbose=True)
+                if result['status'] == 'error':
+                    print(f"Error processing {result['source']}: {result['error']}")
+                record_result(result['source'], result)
+
+            try:
+                previous_result = None
+                for original_filepath in pending_files:
+                    log(f"Processing: {original_filepath}")
+                    result = _split_single_file(
+                        original_filepath, output_directory, audio_format,
+                        segment_duration_ms, naming_convention, verbose=True,
+                        segmentation=segmentation, segment_options=segment_options,
+                        streaming=streaming, source_key=source_keys[original_filepath],
+                        shard_depth=shard_depth, export_queue=export_queue
+                    )
+                    # The previous source's chunks were written while this one was decoded
+                    if previous_result is not None:
+                        finish(previous_result)
+                    previous_result = result
+                if previous_result is not None:
+                    finish(previous_result)
+            finally:
+                if export_queue is not None:
+                    export_queue.close()
+        else:
+            print(f"Splitting {len(pending_files)} files with {workers} worker processes")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        _split_in_worker, original_filepath, output_directory,
+                        audio_format, segment_duration_ms, naming_convention, False,
+                        segmentation, segment_options, streaming, source_keys[original_filepath], shard_depth,
+                        export_threads=export_threads, max_pending_chunks=max_pending_chunks
+                    ): original_filepath
+                    for original_filepath in pending_files
+                }
+                for future in as_completed(futures):
+                    original_filepath = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker itself died (e.g. killed); record it like any other failure
+                        result = {'source': original_filepath, 'status': 'error', 'chunks': [], 'error': str(e)}
+                    record_result(original_filepath, result)
+
+        results = [results_by_source[path] for path in source_files]
+
+        # Keep the chunk list complete once a directory has one (e.g. a later flat run into it)
+        previous_chunks = read_chunk_list(output_directory)
+        if shard_depth > 0 or previous_chunks is not None:
+            if manifest is not None:
+                chunk_names = [name for content_hash in manifest.entries for name in manifest.existing_chunks(content_hash)]
+            else:
+                chunk_names = (previous_chunks or []) + [name for result in results for name in result['chunks']]
+            write_chunk_list(output_directory, chunk_names)
+
+    print(f"\n--- Split Summary ---")
+    for result in results:
+        if result['status'] == 'ok':
+            if not quiet:
+                print(f"  OK: {result['source']} ({len(result['chunks'])} chunks)")
+        elif result['status'] == 'skipped':
+            if not quiet:
+                print(f"  SKIPPED (unchanged): {result['source']}")
+        else:
+            print(f"  ERROR: {result['source']} ({result['error']})")
+    total_chunks = sum(len(result['chunks']) for result in results if result['status'] != 'skipped')
+    failed_count = sum(1 for result in results if result['status'] == 'error')
+    print(f"Total files: {len(results)}, failed: {failed_count}, chunks exported: {total_chunks}")
+    metrics.print_summary()
+
+    return results
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Split audio files into fixed-length chunks.")
+    parser.add_argument("input_dir", nargs="?", help="Input audio directory (prompted if omitted)")
+    parser.add_argument("output_dir", nargs="?", help="Output directory (prompted if omitted)")
+    parser.add_argument("--format", dest="audio_format", default="wav", help="Audio format to process")
+    parser.add_argument("--segment-ms", type=int, default=8000, help="Chunk duration in milliseconds")
+    parser.add_argument("--naming", default="hash", choices=["hash", "indexed"], help="Chunk naming convention")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--segmentation", default="fixed", choices=SEGMENTATION_MODES,
+                        help="Cut at fixed intervals or in silent valleys between phrases")
+    parser.add_argument("--min-segment-ms", type=int, default=5000, help="Minimum length of the pieces a long phrase is cut into in silence mode")
+    parser.add_argument("--max-segment-ms", type=int, default=10000, help="Maximum chunk length in silence mode")
+    parser.add_argument("--silence-thresh", type=float, default=-40.0, help="Silence threshold in dBFS")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Read sources block by block to bound memory on long recordings")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip sources already split with the same settings (uses a manifest)")
+    parser.add_argument("--metrics", help="Write per-file outcomes and stage timings to this JSON lines file")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line per file or chunk")
+    parser.add_argument("--export-threads", type=int, default=2,
+                        help="Threads encoding and writing chunks in the background (0: synchronous)")
+    parser.add_argument("--max-pending-chunks", type=int, default=16,
+                        help="Chunks that may wait to be written before decoding pauses")
+    parser.add_argument("--shard-depth", type=int, default=0,
+                        help="Subdirectory levels for hash-named chunks (0: flat, 1: 256 directories)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    input_dir = input("Input audio directory: ")  # Replace with your input directory
-    output_dir = input("Input output directory: ") # Replace with your desired output directory
+    args = _parse_args()
+    input_dir = args.input_dir or input("Input audio directory: ")  # Replace with your input directory
+    output_dir = args.output_dir or input("Input output directory: ") # Replace with your desired output directory
 
     # Create dummy input files for demonstration
     if not os.path.exists(input_dir):
@@ -79,13 +649,25 @@ if __name__ == "__main__":
             print("Please place some .wav files in 'input_audio' manually for testing.")
 
 
-    # Example 1: Split WAV files into 5-second pieces with hash names
+    # Example 1: Split WAV files into 8-second pieces with hash names
     split_audio_files(
         input_directory=input_dir,
         output_directory=output_dir,
-        audio_format="wav",
-        segment_duration_ms=8000,
-        naming_convention="hash"
+        audio_format=args.audio_format,
+        segment_duration_ms=args.segment_ms,
+        naming_convention=args.naming,
+        workers=args.workers,
+        segmentation=args.segmentation,
+        min_segment_ms=args.min_segment_ms,
+        max_segment_ms=args.max_segment_ms,
+        silence_thresh=args.silence_thresh,
+        streaming=args.streaming,
+        incremental=args.incremental,
+        metrics_path=args.metrics,
+        quiet=args.quiet,
+        export_threads=args.export_threads,
+        max_pending_chunks=args.max_pending_chunks,
+        shard_depth=args.shard_depth
     )
 
     # print("\n--- Splitting with Indexed Naming ---")
@@ -97,4 +679,4 @@ if __name__ == "__main__":
     #     audio_format="wav", # Change to "mp3" if you have mp3s
     #     segment_duration_ms=3000,
     #     naming_convention="indexed"
-    # )
\ No newline at end of file
+    # )
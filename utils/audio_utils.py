@@ -1,9 +1,339 @@
 import os
+import json
+import shutil
+import struct
 import hashlib # Added for generate_chunk_filename
+import subprocess
+from io import BytesIO
+import numpy as np
 from pydub import AudioSegment
 from pydub.exceptions import CouldntDecodeError
+from utils.instrumentation import stage, timed, timed_iter, add_bytes, log
 
-def get_file_duration(filepath, file_extension=None):
+try:
+    import soundfile as sf
+except ImportError:  # Streaming falls back to an ffmpeg pipe
+    sf = None
+
+# Defaults for analyze_audio / compute_audio_metrics.
+ANALYSIS_FRAME_MS = 20            # Frame length for frame-wise RMS (silence detection)
+SILENCE_THRESHOLD_DBFS = -50.0    # Frames quieter than this count as silence
+CLIPPING_THRESHOLD = 0.999        # Samples with |x| at or above this (full scale = 1.0) count as clipped
+GATING_BLOCK_MS = 400             # Block length for gated loudness (as in ITU-R BS.1770)
+GATING_HOP_MS = 100               # 75% block overlap
+GATING_ABSOLUTE_DBFS = -70.0      # Blocks below this never contribute to gated loudness
+GATING_RELATIVE_DB = 10.0         # ...nor do blocks this far below the ungated mean
+LEVEL_HISTOGRAM_MIN_DBFS = -100.0 # Frame levels below this share one underflow bin
+LEVEL_HISTOGRAM_STEP_DB = 0.5     # Bin width of the frame level histogram
+LEVEL_HISTOGRAM_BINS = 1 + int(-LEVEL_HISTOGRAM_MIN_DBFS / LEVEL_HISTOGRAM_STEP_DB)
+
+# Keep/delete criteria understood by check_and_delete_if_low_loudness.
+GATING_MODES = ["dbfs", "gated", "voiced"]
+
+# Formats whose duration is read by ffprobe from container metadata.
+# WAV and FLAC are parsed directly from their headers without spawning a process.
+FFPROBE_FORMATS = ["mp3", "m4a", "ogg", "aac"]
+
+# Chunk list written by split_audio_files into a sharded output directory;
+# list_audio_files reads it instead of walking the tree.
+CHUNK_LIST_FILENAME = ".chunk_list.json"
+CHUNK_LIST_VERSION = 1
+
+# Formats read and written block by block through soundfile (libsndfile).
+# Everything else is streamed through an ffmpeg pipe and encoded by pydub.
+SOUNDFILE_FORMATS = ["wav", "flac", "ogg"]
+
+# Sample data of these WAV encodings, keyed by (format_tag, sample_width), is
+# memory-mapped directly by memmap_wav. 24-bit PCM has no NumPy dtype and is
+# decoded by pydub instead.
+WAV_MEMMAP_DTYPES = {
+    (1, 1): np.dtype('u1'),   # 8-bit PCM is unsigned, centred on 128
+    (1, 2): np.dtype('<i2'),
+    (1, 4): np.dtype('<i4'),
+    (3, 4): np.dtype('<f4'),  # IEEE float
+}
+
+def read_wav_header(filepath):
+    """
+    Parses the RIFF/WAVE header of a file without reading the sample data.
+
+    Args:
+        filepath (str): The path to the WAV file.
+
+    Returns:
+        dict or None: A dict with 'format_tag', 'channels', 'sample_rate',
+                      'sample_width' (bytes per sample), 'block_align',
+                      'data_offset' and 'data_size', or None if the file is not
+                      a WAV file or its header is missing or untrustworthy
+                      (e.g. a streamed file with a placeholder data size).
+    """
+    try:
+        file_size = os.path.getsize(filepath)
+        with open(filepath, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[0:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return None
+
+            fmt = None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                if chunk_id == b'fmt ':
+                    fmt_data = f.read(chunk_size)
+                    if len(fmt_data) < 16:
+                        return None
+                    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt_data[:16])
+                    if format_tag == 0xFFFE and len(fmt_data) >= 26:
+                        # WAVE_FORMAT_EXTENSIBLE: the real format tag is the start of the sub-format GUID
+                        format_tag = struct.unpack('<H', fmt_data[24:26])[0]
+                    fmt = {
+                        'format_tag': format_tag,
+                        'channels': channels,
+                        'sample_rate': sample_rate,
+                        'sample_width': bits // 8,
+                        'block_align': block_align,
+                    }
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if fmt is None or not fmt['channels'] or not fmt['sample_rate'] or not fmt['block_align']:
+                        return None
+                    data_offset = f.tell()
+                    # A size running past the end of file means the writer never patched the header
+                    if chunk_size == 0 or data_offset + chunk_size > file_size:
+                        return None
+                    fmt['data_offset'] = data_offset
+                    fmt['data_size'] = chunk_size
+                    return fmt
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+def memmap_wav(filepath):
+    """
+    Memory-maps the sample data of a WAV file without reading or copying it.
+
+    Slicing the returned array gives views into the file; pages are only read
+    when the samples are used. Durations, chunk boundaries and chunk exports
+    (see write_wav_array) can therefore work on the file in place.
+
+    Args:
+        filepath (str): The path to the WAV file.
+
+    Returns:
+        tuple or None: (samples, sample_rate) where samples is a read-only array
+                       of shape (frames, channels) in the file's own sample format
+                       (see WAV_MEMMAP_DTYPES), or None if the file cannot be
+                       mapped (not a WAV file, untrustworthy header, or an
+                       encoding such as 24-bit PCM) and should be decoded instead.
+    """
+    header = read_wav_header(filepath)
+    if header is None:
+        return None
+    dtype = WAV_MEMMAP_DTYPES.get((header['format_tag'], header['sample_width']))
+    if dtype is None or header['block_align'] != header['channels'] * header['sample_width']:
+        return None
+    frame_count = header['data_size'] // header['block_align']
+    if frame_count == 0:
+        return None
+    samples = np.memmap(
+        filepath, dtype=dtype, mode='r', offset=header['data_offset'],
+        shape=(frame_count, header['channels'])
+    )
+    return samples, header['sample_rate']
+
+def pcm_to_float(samples):
+    """
+    Converts samples from memmap_wav to float32 scaled to [-1.0, 1.0].
+
+    This is the point where mapped sample data is actually read (the "decode" stage).
+
+    Args:
+        samples (numpy.ndarray): Samples of one of the WAV_MEMMAP_DTYPES.
+
+    Returns:
+        numpy.ndarray: float32 samples of the same shape.
+    """
+    with stage("decode", samples.nbytes):
+        if samples.dtype.kind == 'f':
+            return np.array(samples, dtype=np.float32)
+        if samples.dtype.kind == 'u':
+            return (samples.astype(np.float32) - 128.0) / 128.0
+        return samples.astype(np.float32) / float(1 << (8 * samples.dtype.itemsize - 1))
+
+def load_audio_array(filepath, file_extension=None):
+    """
+    Loads a whole audio file as float32 samples.
+
+    Mappable WAV files are read through memmap_wav; everything else is decoded by pydub.
+
+    Args:
+        filepath (str): The path to the audio file.
+        file_extension (str, optional): The file extension.
+                                         If None, it's inferred from filepath.
+
+    Returns:
+        tuple: (samples, sample_rate) with samples of shape (frames, channels).
+
+    Raises:
+        CouldntDecodeError: If pydub/ffmpeg cannot decode the file.
+    """
+    if file_extension is None:
+        _, file_extension = os.path.splitext(filepath)
+    if file_extension.lower().lstrip('.') == "wav":
+        mapped = memmap_wav(filepath)
+        if mapped is not None:
+            samples, sample_rate = mapped
+            return pcm_to_float(samples), sample_rate
+    audio = decode_audio(filepath, file_extension)
+    return audio_segment_to_array(audio), audio.frame_rate
+
+def write_wav_array(samples, sample_rate, output_filepath):
+    """
+    Writes samples to a WAV file as they are, without converting or re-encoding them.
+
+    The RIFF header is followed by the array's bytes, so a slice of a
+    memmap_wav array is copied straight from the mapped source file.
+
+    Args:
+        samples (numpy.ndarray): Samples of one of the WAV_MEMMAP_DTYPES, shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+        output_filepath (str): Where to write the file.
+    """
+    samples = np.ascontiguousarray(samples)
+    channels = samples.shape[1]
+    sample_width = samples.dtype.itemsize
+    format_tag = 3 if samples.dtype.kind == 'f' else 1
+    data_size = samples.nbytes
+    padding = data_size % 2  # RIFF chunks are word aligned
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size + padding, b'WAVE',
+        b'fmt ', 16, format_tag, channels, sample_rate,
+        sample_rate * channels * sample_width, channels * sample_width, 8 * sample_width,
+        b'data', data_size
+    )
+    with stage("write", len(header) + data_size + padding):
+        with open(output_filepath, 'wb') as f:
+            f.write(header)
+            f.write(memoryview(samples.reshape(-1)))
+            if padding:
+                f.write(b'\x00')
+
+def _read_flac_streaminfo(filepath):
+    """
+    Reads sample rate, channel count and total sample count from a FLAC STREAMINFO block.
+
+    Returns:
+        dict or None: A dict with 'duration', 'sample_rate' and 'channels',
+                      or None if the header is missing or the total sample
+                      count is unknown (0).
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            if f.read(4) != b'fLaC':
+                return None
+            block_header = f.read(4)
+            # STREAMINFO is mandatory and always the first metadata block (type 0)
+            if len(block_header) < 4 or (block_header[0] & 0x7F) != 0:
+                return None
+            streaminfo = f.read(34)
+            if len(streaminfo) < 34:
+                return None
+    except OSError:
+        return None
+
+    packed = int.from_bytes(streaminfo[10:18], 'big')
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if sample_rate == 0 or total_samples == 0:
+        return None
+    return {
+        'duration': total_samples / sample_rate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+    }
+
+def _ffprobe_audio_info(filepath):
+    """
+    Reads duration, sample rate and channel count with a single ffprobe call.
+
+    Returns:
+        dict or None: A dict with 'duration', 'sample_rate' and 'channels'
+                      (the latter two may be None), or None if ffprobe is
+                      unavailable or reports no usable duration.
+    """
+    prober = shutil.which("ffprobe") or shutil.which("avprobe")
+    if prober is None:
+        return None
+
+    command = [
+        prober, "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration:stream=sample_rate,channels",
+        "-of", "json",
+        filepath,
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        info = json.loads(output.decode("utf-8", errors="replace") or "{}")
+        duration = float(info.get("format", {}).get("duration", 0))
+    except (OSError, subprocess.CalledProcessError, ValueError, TypeError):
+        return None
+    if duration <= 0:
+        return None
+
+    streams = info.get("streams") or [{}]
+    sample_rate = streams[0].get("sample_rate")
+    channels = streams[0].get("channels")
+    return {
+        'duration': duration,
+        'sample_rate': int(sample_rate) if sample_rate else None,
+        'channels': int(channels) if channels else None,
+    }
+
+@timed("probe")
+def probe_audio_info(filepath, file_extension=None):
+    """
+    Reads duration, sample rate and channel count from container metadata
+    without decoding the audio.
+
+    WAV and FLAC headers are parsed directly; mp3/m4a/ogg/aac use one ffprobe call.
+
+    Args:
+        filepath (str): The path to the audio file.
+        file_extension (str, optional): The file extension.
+                                         If None, it's inferred from filepath.
+
+    Returns:
+        dict or None: A dict with 'duration' (seconds), 'sample_rate' and
+                      'channels', or None if the metadata is missing or
+                      untrustworthy and the caller should decode instead.
+    """
+    if file_extension is None:
+        _, file_extension = os.path.splitext(filepath)
+    file_extension = file_extension.lower().lstrip('.')
+
+    if file_extension == "wav":
+        header = read_wav_header(filepath)
+        if header is None:
+            return None
+        return {
+            'duration': header['data_size'] / header['block_align'] / header['sample_rate'],
+            'sample_rate': header['sample_rate'],
+            'channels': header['channels'],
+        }
+    if file_extension == "flac":
+        return _read_flac_streaminfo(filepath)
+    if file_extension in FFPROBE_FORMATS:
+        return _ffprobe_audio_info(filepath)
+    return None
+
+def get_file_duration(filepath, file_extension=None, use_metadata=True, index=None):
     """
     Calculates the duration of an audio file.
 
@@ -12,32 +342,601 @@ def get_file_duration(filepath, file_extension=None):
         file_extension (str, optional): The file extension.
                                          If None, it's inferred from filepath.
                                          Defaults to None.
+        use_metadata (bool): If True (default), read the duration from the
+                             container metadata (see probe_audio_info) and only
+                             decode the file when that fails. If False, always
+                             decode the full file.
+        index (utils.audio_index.AudioIndex, optional): If given, a cached duration
+                             is returned for unchanged files and newly computed
+                             results are stored in it.
 
     Returns:
         float or None: The duration of the audio file in seconds,
                        or None if the duration cannot be determined.
     """
+    if index is not None:
+        cached = index.lookup(filepath)
+        if cached is not None and cached['duration'] is not None:
+            return cached['duration']
+
     if file_extension is None:
         _, file_extension = os.path.splitext(filepath)
 
     # pydub expects the extension without the leading dot
     file_extension = file_extension.lstrip('.')
 
-    try:
+    if use_metadata:
+        info = probe_audio_info(filepath, file_extension)
+        if info is not None:
+            if index is not None:
+                index.store(filepath, **info)
+            return info['duration']
+
+    record = analyze_audio(filepath, file_extension, index=index, purpose="duration")
+    if record is None:
+        return None
+    return record['duration']
+
+def decode_audio(filepath, file_extension=None):
+    """
+    Decodes an audio file into a pydub AudioSegment.
+
+    Args:
+        filepath (str): The path to the audio file.
+        file_extension (str, optional): The file extension.
+                                         If None, it's inferred from filepath.
+
+    Returns:
+        AudioSegment: The decoded audio.
+
+    Raises:
+        CouldntDecodeError: If pydub/ffmpeg cannot decode the file.
+    """
+    if file_extension is None:
+        _, file_extension = os.path.splitext(filepath)
+
+    file_extension = file_extension.lstrip('.')
+
+    with stage("decode", os.path.getsize(filepath)):
         # Explicitly pass the format if known, otherwise pydub tries to infer
         if file_extension:
-            audio = AudioSegment.from_file(filepath, format=file_extension)
+            return AudioSegment.from_file(filepath, format=file_extension)
+        # If no extension after stripping, let pydub try to infer
+        return AudioSegment.from_file(filepath)
+
+def audio_segment_to_array(audio):
+    """
+    Converts an AudioSegment into a float32 NumPy array scaled to [-1.0, 1.0].
+
+    Args:
+        audio (AudioSegment): The decoded audio.
+
+    Returns:
+        numpy.ndarray: An array of shape (frames, channels).
+    """
+    if audio.sample_width == 3:
+        # There is no 24-bit NumPy dtype; widen to 32-bit first
+        audio = audio.set_sample_width(4)
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[audio.sample_width]
+    # pydub already re-biases unsigned 8-bit WAV data to signed samples
+    samples = np.frombuffer(audio.raw_data, dtype=dtype)
+    full_scale = float(1 << (8 * audio.sample_width - 1))
+    return (samples.astype(np.float32) / full_scale).reshape(-1, audio.channels)
+
+def array_to_audio_segment(samples, sample_rate, sample_width=2):
+    """
+    Converts a float array scaled to [-1.0, 1.0] back into an AudioSegment.
+
+    Args:
+        samples (numpy.ndarray): An array of shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+        sample_width (int): Bytes per sample of the result (2 or 4).
+
+    Returns:
+        AudioSegment: The audio as integer PCM.
+    """
+    dtype = {2: np.int16, 4: np.int32}[sample_width]
+    full_scale = float(1 << (8 * sample_width - 1))
+    pcm = np.clip(np.round(samples * full_scale), -full_scale, full_scale - 1).astype(dtype)
+    return AudioSegment(
+        data=pcm.tobytes(),
+        sample_width=sample_width,
+        frame_rate=sample_rate,
+        channels=samples.shape[1]
+    )
+
+def resample_audio(samples, sample_rate, target_sample_rate):
+    """
+    Resamples a float sample array with a polyphase filter.
+
+    Uses scipy.signal.resample_poly when SciPy is installed (it is a so-vits-svc
+    dependency) and falls back to linear interpolation otherwise.
+
+    Args:
+        samples (numpy.ndarray): Float samples, shape (frames, channels).
+        sample_rate (int): The current sample rate in Hz.
+        target_sample_rate (int): The desired sample rate in Hz.
+
+    Returns:
+        numpy.ndarray: float32 samples at target_sample_rate, shape (frames, channels).
+    """
+    if sample_rate == target_sample_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly
+        divisor = gcd(sample_rate, target_sample_rate)
+        resampled = resample_poly(samples, target_sample_rate // divisor, sample_rate // divisor, axis=0)
+        return resampled.astype(np.float32)
+    except ImportError:
+        frame_count = int(round(len(samples) * target_sample_rate / sample_rate))
+        source_positions = np.arange(len(samples)) / sample_rate
+        target_positions = np.arange(frame_count) / target_sample_rate
+        return np.stack(
+            [np.interp(target_positions, source_positions, samples[:, channel]) for channel in range(samples.shape[1])],
+            axis=1
+        ).astype(np.float32)
+
+def iter_audio_blocks(filepath, block_ms, file_extension=None):
+    """
+    Reads an audio file block by block without holding the whole file in memory.
+
+    WAV files that memmap_wav can map are read in place. Other wav/flac/ogg
+    files are read with soundfile when it is installed; other formats (and
+    all formats without soundfile) are decoded by an ffmpeg pipe.
+
+    Args:
+        filepath (str): The path to the audio file.
+        block_ms (int): The length of each block in milliseconds. The last
+                        block may be shorter.
+        file_extension (str, optional): The file extension.
+                                         If None, it's inferred from filepath.
+
+    Yields:
+        tuple: (samples, sample_rate) where samples is a float32 array of
+               shape (frames, channels) scaled to [-1.0, 1.0].
+
+    Raises:
+        CouldntDecodeError: If the file cannot be opened or decoded.
+    """
+    if file_extension is None:
+        _, file_extension = os.path.splitext(filepath)
+    file_extension = file_extension.lower().lstrip('.')
+
+    mapped = memmap_wav(filepath) if file_extension == "wav" else None
+    if mapped is not None:
+        samples, sample_rate = mapped
+        block_frames = max(1, sample_rate * block_ms // 1000)
+        for start in range(0, len(samples), block_frames):
+            yield pcm_to_float(samples[start:start + block_frames]), sample_rate
+        return
+
+    add_bytes("decode", os.path.getsize(filepath))
+    if sf is not None and file_extension in SOUNDFILE_FORMATS:
+        try:
+            sample_rate = sf.info(filepath).samplerate
+        except RuntimeError as e:
+            raise CouldntDecodeError(f"soundfile could not open {filepath}: {e}")
+        block_frames = max(1, sample_rate * block_ms // 1000)
+        blocks = sf.blocks(filepath, blocksize=block_frames, dtype='float32', always_2d=True)
+        for block in timed_iter(blocks, "decode"):
+            yield block, sample_rate
+        return
+
+    info = _ffprobe_audio_info(filepath)
+    if info is None or not info['sample_rate'] or not info['channels']:
+        raise CouldntDecodeError(f"Could not probe {filepath} for streaming")
+    sample_rate, channels = info['sample_rate'], info['channels']
+    block_frames = max(1, sample_rate * block_ms // 1000)
+    block_bytes = block_frames * channels * 4
+
+    command = [
+        shutil.which("ffmpeg") or "ffmpeg", "-v", "error", "-i", filepath,
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sample_rate), "-",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        pending = b""
+        while True:
+            with stage("decode"):
+                data = process.stdout.read(block_bytes - len(pending))
+            if not data:
+                break
+            pending += data
+            if len(pending) == block_bytes:
+                yield np.frombuffer(pending, dtype=np.float32).reshape(-1, channels), sample_rate
+                pending = b""
+        if pending:
+            usable = len(pending) - len(pending) % (channels * 4)
+            yield np.frombuffer(pending[:usable], dtype=np.float32).reshape(-1, channels), sample_rate
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise CouldntDecodeError(f"ffmpeg failed to decode {filepath}: {stderr.decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+def export_audio_array(samples, sample_rate, output_filepath, audio_format):
+    """
+    Writes a float sample array to disk in the given format.
+
+    wav/flac/ogg are written directly by soundfile (16-bit PCM for wav/flac);
+    other formats go through pydub and ffmpeg.
+
+    Args:
+        samples (numpy.ndarray): Float samples in [-1.0, 1.0], shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+        output_filepath (str): Where to write the file.
+        audio_format (str): The output format (e.g. "wav").
+    """
+    audio_format = audio_format.lower().lstrip('.')
+    encoded = BytesIO()
+    with stage("encode"):
+        if sf is not None and audio_format in SOUNDFILE_FORMATS:
+            subtype = "VORBIS" if audio_format == "ogg" else "PCM_16"
+            sf.write(encoded, samples, sample_rate, format=audio_format.upper(), subtype=subtype)
         else:
-            # If no extension after stripping, let pydub try to infer
-            audio = AudioSegment.from_file(filepath)
-        return len(audio) / 1000.0
+            array_to_audio_segment(samples, sample_rate).export(encoded, format=audio_format)
+    write_encoded_audio(encoded.getbuffer(), output_filepath)
+
+def export_audio_segment(audio, output_filepath, audio_format):
+    """
+    Writes a pydub AudioSegment to disk, timing encoding and writing separately.
+
+    Args:
+        audio (AudioSegment): The audio to export.
+        output_filepath (str): Where to write the file.
+        audio_format (str): The output format (e.g. "wav").
+    """
+    encoded = BytesIO()
+    with stage("encode"):
+        audio.export(encoded, format=audio_format)
+    write_encoded_audio(encoded.getbuffer(), output_filepath)
+
+def write_encoded_audio(data, output_filepath):
+    """Writes already encoded bytes to output_filepath (the "write" stage)."""
+    with stage("write", len(data)):
+        with open(output_filepath, 'wb') as f:
+            f.write(data)
+
+def amplitude_to_dbfs(amplitude):
+    """Converts a linear amplitude (full scale = 1.0) to dBFS; 0 maps to -inf."""
+    with np.errstate(divide='ignore'):
+        return 20.0 * np.log10(amplitude)
+
+def frame_rms(samples, frame_length):
+    """
+    Computes the RMS of consecutive, non-overlapping frames of a mono signal.
+
+    A trailing partial frame is zero-padded so that every sample is covered.
+
+    Args:
+        samples (numpy.ndarray): A 1-D float array.
+        frame_length (int): The number of samples per frame.
+
+    Returns:
+        numpy.ndarray: One RMS value per frame.
+    """
+    frame_length = max(1, int(frame_length))
+    frame_count = -(-len(samples) // frame_length)
+    padded = np.zeros(frame_count * frame_length, dtype=np.float32)
+    padded[:len(samples)] = samples
+    frames = padded.reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+
+def gated_loudness(samples, sample_rate):
+    """
+    Measures loudness over 400 ms blocks with BS.1770-style absolute and relative gating.
+
+    Quiet blocks (silence, room noise between phrases) are excluded before
+    averaging, so the result reflects how loud the audible part is rather
+    than how much of the file is silent. No K-weighting filter is applied, so
+    the value is in dBFS and directly comparable with the whole-file dBFS.
+
+    Args:
+        samples (numpy.ndarray): Float samples in [-1.0, 1.0], shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+
+    Returns:
+        float: The gated loudness in dBFS, or -inf if every block is gated out.
+    """
+    power = np.mean(np.square(samples, dtype=np.float64), axis=1)
+    if len(power) == 0:
+        return float('-inf')
+    block_length = min(len(power), max(1, sample_rate * GATING_BLOCK_MS // 1000))
+    hop_length = max(1, sample_rate * GATING_HOP_MS // 1000)
+
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    block_starts = np.arange(0, len(power) - block_length + 1, hop_length)
+    block_power = (cumulative[block_starts + block_length] - cumulative[block_starts]) / block_length
+
+    return gate_block_powers(block_power)
+
+def gate_block_powers(block_power):
+    """
+    Applies the absolute and relative gates of gated_loudness to block mean-square powers.
+
+    Args:
+        block_power (numpy.ndarray): Mean-square power of each loudness block.
+
+    Returns:
+        float: The gated loudness in dBFS, or -inf if every block is gated out.
+    """
+    block_power = np.asarray(block_power, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        block_levels = 10.0 * np.log10(block_power)
+    gated = block_power[block_levels >= GATING_ABSOLUTE_DBFS]
+    if len(gated) == 0:
+        return float('-inf')
+    relative_gate = 10.0 * np.log10(gated.mean()) - GATING_RELATIVE_DB
+    with np.errstate(divide='ignore'):
+        gated = gated[10.0 * np.log10(gated) >= relative_gate]
+    return float(10.0 * np.log10(gated.mean()))
+
+@timed("analyse")
+def compute_audio_metrics(
+    samples,
+    sample_rate,
+    frame_ms=ANALYSIS_FRAME_MS,
+    silence_threshold_dbfs=SILENCE_THRESHOLD_DBFS,
+    clipping_threshold=CLIPPING_THRESHOLD
+):
+    """
+    Computes level statistics for an in-memory sample array.
+
+    Args:
+        samples (numpy.ndarray): Float samples in [-1.0, 1.0], shape (frames, channels).
+        sample_rate (int): The sample rate in Hz.
+        frame_ms (int): Frame length in milliseconds used for the silence fraction.
+        silence_threshold_dbfs (float): Frames whose RMS is below this are silent.
+        clipping_threshold (float): Absolute sample value counted as clipped.
+
+    Returns:
+        dict: 'duration' (seconds), 'sample_rate', 'channels', 'dbfs' (overall RMS
+              level), 'gated_dbfs' (see gated_loudness), 'peak' and 'rms' (linear,
+              full scale = 1.0), 'clipping_ratio' (fraction of samples at or above
+              clipping_threshold), 'silence_fraction' (fraction of frames below
+              silence_threshold_dbfs), 'silence_thresh' (the threshold used) and
+              'level_histogram' (frame level counts, see level_histogram).
+    """
+    frame_count, channels = samples.shape
+    if frame_count == 0:
+        return {
+            'duration': 0.0, 'sample_rate': sample_rate, 'channels': channels,
+            'dbfs': float('-inf'), 'gated_dbfs': float('-inf'), 'peak': 0.0, 'rms': 0.0,
+            'clipping_ratio': 0.0, 'silence_fraction': 1.0, 'silence_thresh': silence_threshold_dbfs,
+            'level_histogram': level_histogram(np.zeros(0)),
+        }
+
+    magnitudes = np.abs(samples)
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    mono = samples.mean(axis=1) if channels > 1 else samples[:, 0]
+    frame_levels = amplitude_to_dbfs(frame_rms(mono, sample_rate * frame_ms // 1000))
+
+    return {
+        'duration': frame_count / sample_rate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'dbfs': float(amplitude_to_dbfs(rms)),
+        'gated_dbfs': gated_loudness(samples, sample_rate),
+        'peak': float(magnitudes.max()),
+        'rms': rms,
+        'clipping_ratio': float(np.count_nonzero(magnitudes >= clipping_threshold) / magnitudes.size),
+        'silence_fraction': float(np.count_nonzero(frame_levels < silence_threshold_dbfs) / len(frame_levels)),
+        'silence_thresh': silence_threshold_dbfs,
+        'level_histogram': level_histogram(frame_levels),
+    }
+
+def level_histogram(frame_levels):
+    """
+    Counts frame levels in LEVEL_HISTOGRAM_STEP_DB wide bins.
+
+    Bin 0 holds every frame below LEVEL_HISTOGRAM_MIN_DBFS (including digital
+    silence); bin i > 0 starts at LEVEL_HISTOGRAM_MIN_DBFS + (i - 1) * step,
+    and the last bin also holds frames at or above 0 dBFS.
+
+    Args:
+        frame_levels (numpy.ndarray): Frame RMS levels in dBFS.
+
+    Returns:
+        bytes: LEVEL_HISTOGRAM_BINS little-endian uint32 counts, as stored in the index.
+    """
+    clipped = np.clip(frame_levels, LEVEL_HISTOGRAM_MIN_DBFS - LEVEL_HISTOGRAM_STEP_DB, 0.0)
+    bins = np.floor((clipped - LEVEL_HISTOGRAM_MIN_DBFS) / LEVEL_HISTOGRAM_STEP_DB).astype(np.int64) + 1
+    counts = np.bincount(np.minimum(bins, LEVEL_HISTOGRAM_BINS - 1), minlength=LEVEL_HISTOGRAM_BINS)
+    return counts.astype('<u4').tobytes()
+
+def voiced_fraction(record, threshold_dbfs):
+    """
+    Returns the share of a record's frames at or above a level, from its level histogram.
+
+    Exact for thresholds on the LEVEL_HISTOGRAM_STEP_DB grid; other thresholds
+    are rounded up to the next bin edge. Frames below LEVEL_HISTOGRAM_MIN_DBFS
+    never count as voiced.
+
+    Args:
+        record (dict): A record from analyze_audio or compute_audio_metrics.
+        threshold_dbfs (float): The frame level in dBFS.
+
+    Returns:
+        float: The voiced fraction in [0.0, 1.0] (0.0 for an empty file).
+    """
+    counts = np.frombuffer(record['level_histogram'], dtype='<u4')
+    total = int(counts.sum())
+    if total == 0:
+        return 0.0
+    first_bin = 1 + int(np.ceil((threshold_dbfs - LEVEL_HISTOGRAM_MIN_DBFS) / LEVEL_HISTOGRAM_STEP_DB))
+    first_bin = min(max(first_bin, 1), LEVEL_HISTOGRAM_BINS - 1)
+    return int(counts[first_bin:].sum()) / total
+
+@timed("segment")
+def find_segment_boundaries(
+    samples,
+    sample_rate,
+    min_segment_ms=5000,
+    max_segment_ms=10000,
+    silence_thresh=-40.0,
+    min_silence_len=300,
+    keep_silence=100,
+    min_keep_ms=2000,
+    frame_ms=ANALYSIS_FRAME_MS
+):
+    """
+    Chooses chunk boundaries that follow the phrasing of a vocal track.
+
+    Frame-wise RMS energy is computed in one pass. Silences of at least
+    min_silence_len split the track into voiced regions and are dropped;
+    shorter pauses stay inside a region. Regions longer than max_segment_ms
+    are cut at the quietest frame that keeps each piece within
+    [min_segment_ms, max_segment_ms] where possible. Regions are never joined
+    across a dropped silence, so a short phrase becomes a short chunk (or is
+    dropped, see min_keep_ms). The silence parameters follow
+    pydub.silence.split_on_silence.
+
+    Args:
+        samples (numpy.ndarray): Float samples, shape (frames, channels) or (frames,).
+        sample_rate (int): The sample rate in Hz.
+        min_segment_ms (int): Minimum length of the pieces a long region is cut into.
+        max_segment_ms (int): Maximum chunk length in milliseconds, padding included.
+        silence_thresh (float): Frames below this RMS level (dBFS) are silent.
+        min_silence_len (int): Minimum silence length in milliseconds that separates phrases.
+        keep_silence (int): Milliseconds of the dropped silence kept next to a
+                            chunk. Edges created by cutting a long region are
+                            not padded, so chunks never overlap.
+        min_keep_ms (int): Chunks shorter than this (excluding keep_silence) are dropped.
+        frame_ms (int): Analysis frame length in milliseconds.
+
+    Returns:
+        list: (start_sample, end_sample) tuples, in order.
+    """
+    mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+    frame_length = max(1, sample_rate * frame_ms // 1000)
+    levels = amplitude_to_dbfs(frame_rms(mono, frame_length))
+    frame_count = len(levels)
+    if frame_count == 0:
+        return []
+
+    def to_frames(ms):
+        return max(1, int(round(ms / frame_ms)))
+
+    min_frames = to_frames(min_segment_ms)
+    max_frames = max(min_frames, to_frames(max_segment_ms))
+
+    # Runs of silent frames; those long enough (or touching either end) separate phrases
+    silent = np.concatenate(([0], (levels < silence_thresh).astype(np.int8), [0]))
+    edges = np.diff(silent)
+    silence_starts = np.flatnonzero(edges == 1)
+    silence_ends = np.flatnonzero(edges == -1)
+    separating = (
+        (silence_ends - silence_starts >= to_frames(min_silence_len))
+        | (silence_starts == 0)
+        | (silence_ends == frame_count)
+    )
+    region_starts = np.concatenate(([0], silence_ends[separating]))
+    region_ends = np.concatenate((silence_starts[separating], [frame_count]))
+    regions = [(int(start), int(end)) for start, end in zip(region_starts, region_ends) if end > start]
+
+    # Cut long regions at the lowest-energy frame inside the allowed window,
+    # remembering which edges border a dropped silence
+    segments = []
+    for start, end in regions:
+        pad_start = True
+        while end - start > max_frames:
+            window_start = start + min_frames
+            window_end = min(start + max_frames, end - min_frames)
+            if window_end < window_start:
+                window_end = start + max_frames
+            cut = window_start + int(np.argmin(levels[window_start:window_end + 1]))
+            segments.append((start, cut, pad_start, False))
+            start = cut
+            pad_start = False
+        segments.append((start, end, pad_start, True))
+
+    min_keep_frames = min_keep_ms / frame_ms
+    keep_samples = sample_rate * keep_silence // 1000
+    max_samples = max_frames * frame_length
+    total_samples = len(mono)
+    boundaries = []
+    for start, end, pad_start, pad_end in segments:
+        if end - start < min_keep_frames:
+            continue
+        start_sample = start * frame_length
+        end_sample = min(total_samples, end * frame_length)
+        # Padding never pushes a chunk past max_segment_ms or into the previous chunk
+        spare = max(0, max_samples - (end_sample - start_sample))
+        before = min(keep_samples, spare // 2 if pad_end else spare) if pad_start else 0
+        after = min(keep_samples, spare - before) if pad_end else 0
+        start_sample = max(start_sample - before, boundaries[-1][1] if boundaries else 0)
+        boundaries.append((start_sample, min(total_samples, end_sample + after)))
+    return boundaries
+
+def get_cached_analysis(index, filepath, silence_threshold_dbfs=SILENCE_THRESHOLD_DBFS):
+    """
+    Returns a complete, up-to-date analyze_audio record from the index, if there is one.
+
+    Args:
+        index (utils.audio_index.AudioIndex): The analysis cache.
+        filepath (str): The path to the audio file.
+        silence_threshold_dbfs (float): The silence threshold the record must have been measured with.
+
+    Returns:
+        dict or None: The cached record, or None if the file must be analysed.
+    """
+    cached = index.lookup(filepath)
+    if (cached is not None and all(value is not None for value in cached.values())
+            and cached['silence_thresh'] == silence_threshold_dbfs):
+        return cached
+    return None
+
+def analyze_audio(
+    filepath,
+    file_extension=None,
+    index=None,
+    purpose="analysis",
+    silence_threshold_dbfs=SILENCE_THRESHOLD_DBFS
+):
+    """
+    Decodes an audio file once and measures everything the dataset tools need.
+
+    Args:
+        filepath (str): The path to the audio file.
+        file_extension (str, optional): The file extension.
+                                         If None, it's inferred from filepath.
+        index (utils.audio_index.AudioIndex, optional): If given, a complete cached
+                                         record is returned for unchanged files and
+                                         newly computed records are stored in it.
+        purpose (str): What the caller needs the record for; only used in warnings.
+        silence_threshold_dbfs (float): Frame level below which a frame counts
+                                         towards 'silence_fraction'. A cached record
+                                         measured with a different threshold is
+                                         recomputed. Voiced gating does not need it:
+                                         it reads 'level_histogram' instead.
+
+    Returns:
+        dict or None: The record described in compute_audio_metrics,
+                      or None if the file cannot be decoded.
+    """
+    if index is not None:
+        cached = get_cached_analysis(index, filepath, silence_threshold_dbfs)
+        if cached is not None:
+            return cached
+
+    try:
+        samples, sample_rate = load_audio_array(filepath, file_extension)
+        record = compute_audio_metrics(samples, sample_rate, silence_threshold_dbfs=silence_threshold_dbfs)
     except CouldntDecodeError:
-        print(f"Warning: Could not decode {filepath} for duration check.")
+        print(f"Warning: Could not decode {filepath} for {purpose} check.")
         return None
     except Exception as e:
-        print(f"Warning: Error processing {filepath} for duration: {e}")
+        print(f"Warning: Error processing {filepath} for {purpose}: {e}")
         return None
 
+    if index is not None:
+        index.store(filepath, **record)
+    return record
+
 def is_supported_audio_file(filename, supported_formats):
     """
     Checks if the given filename has a supported audio file extension.
@@ -53,6 +952,80 @@ def is_supported_audio_file(filename, supported_formats):
     _, ext = os.path.splitext(filename)
     return ext.lower().lstrip('.') in supported_formats
 
+def read_chunk_list(directory_path):
+    """
+    Reads the chunk list of a split output directory.
+
+    Returns:
+        list or None: Chunk paths relative to directory_path ("/"-separated),
+                      or None if the directory has no (readable) chunk list.
+    """
+    list_path = os.path.join(directory_path, CHUNK_LIST_FILENAME)
+    if not os.path.exists(list_path):
+        return None
+    try:
+        with open(list_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read chunk list {list_path} ({e}); scanning the directory instead.")
+        return None
+    if data.get('version') != CHUNK_LIST_VERSION:
+        print(f"Warning: Ignoring chunk list {list_path} with unknown version.")
+        return None
+    return data['chunks']
+
+def write_chunk_list(directory_path, chunk_names):
+    """
+    Writes the chunk list of a split output directory atomically.
+
+    Args:
+        directory_path (str): The split output directory.
+        chunk_names (iterable): Chunk paths relative to directory_path; duplicates are dropped.
+    """
+    list_path = os.path.join(directory_path, CHUNK_LIST_FILENAME)
+    temporary_path = f"{list_path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CHUNK_LIST_VERSION, 'chunks': list(dict.fromkeys(chunk_names))}, f, ensure_ascii=False)
+    os.replace(temporary_path, list_path)
+
+def remove_from_chunk_list(directory_path, removed_filepaths):
+    """Drops deleted files from a directory's chunk list, if it has one."""
+    chunk_names = read_chunk_list(directory_path)
+    if chunk_names is None or not removed_filepaths:
+        return
+    removed = {os.path.relpath(path, directory_path).replace(os.sep, "/") for path in removed_filepaths}
+    write_chunk_list(directory_path, [name for name in chunk_names if name not in removed])
+
+def list_audio_files(directory_path, supported_formats, use_chunk_list=True):
+    """
+    Lists the supported audio files of a directory tree.
+
+    If the directory has a chunk list (written by split_audio_files for a
+    sharded layout), the files are taken from it and the tree is not walked;
+    listed files that no longer exist are left out. Files added to the
+    directory by hand are only found with use_chunk_list=False.
+
+    Args:
+        directory_path (str): The directory to list.
+        supported_formats (list): Audio file extensions to include.
+        use_chunk_list (bool): If False, always walk the tree.
+
+    Returns:
+        list: Full paths of the audio files.
+    """
+    chunk_names = read_chunk_list(directory_path) if use_chunk_list else None
+    if chunk_names is not None:
+        filepaths = (os.path.join(directory_path, name) for name in chunk_names
+                     if is_supported_audio_file(name, supported_formats))
+        return [filepath for filepath in filepaths if os.path.exists(filepath)]
+
+    filepaths = []
+    for root, _, files in os.walk(directory_path):
+        for filename in files:
+            if is_supported_audio_file(filename, supported_formats):
+                filepaths.append(os.path.join(root, filename))
+    return filepaths
+
 def format_duration(total_seconds):
     """
     Formats a total duration in seconds into a human-readable string (HH:MM:SS).
@@ -62,7 +1035,7 @@ def format_duration(total_seconds):
     seconds = total_seconds % 60
     return f"{hours:02d}:{minutes:02d}:{seconds:05.2f}"
 
-def get_audio_loudness(filepath, file_extension=None):
+def get_audio_loudness(filepath, file_extension=None, index=None):
     """
     Measures the loudness of an audio file.
 
@@ -71,30 +1044,58 @@ def get_audio_loudness(filepath, file_extension=None):
         file_extension (str, optional): The file extension.
                                          If None, it's inferred from filepath.
                                          Defaults to None.
+        index (utils.audio_index.AudioIndex, optional): If given, a cached loudness
+                                         is returned for unchanged files and newly
+                                         computed results are stored in it.
 
     Returns:
         float or None: The loudness of the audio file in dBFS,
                        or None if loudness cannot be determined.
     """
-    if file_extension is None:
-        _, file_extension = os.path.splitext(filepath)
+    if index is not None:
+        cached = index.lookup(filepath)
+        if cached is not None and cached['dbfs'] is not None:
+            return cached['dbfs']
 
-    file_extension = file_extension.lstrip('.')
-
-    try:
-        if file_extension:
-            audio = AudioSegment.from_file(filepath, format=file_extension)
-        else:
-            audio = AudioSegment.from_file(filepath)
-        return audio.dBFS
-    except CouldntDecodeError:
-        print(f"Warning: Could not decode {filepath} for loudness check")
-        return None
-    except Exception as e:
-        print(f"Warning: Error processing {filepath} for loudness: {e}")
+    record = analyze_audio(filepath, file_extension, index=index, purpose="loudness")
+    if record is None:
         return None
+    return record['dbfs']
+
+def gate_audio_record(record, loudness_threshold_dbfs, gating="dbfs", min_voiced_fraction=0.5):
+    """
+    Decides whether an analysed file is loud enough to keep.
+
+    Args:
+        record (dict): A record from analyze_audio or compute_audio_metrics.
+        loudness_threshold_dbfs (float): The loudness threshold in dBFS.
+        gating (str): "dbfs" compares the whole-file dBFS with the threshold.
+                      "gated" compares the gated loudness (see gated_loudness).
+                      "voiced" keeps the file if at least min_voiced_fraction of
+                      its frames are at or above the threshold.
+        min_voiced_fraction (float): Minimum share of voiced frames for "voiced" gating.
 
-def check_and_delete_if_low_loudness(filepath, loudness_threshold_dbfs, file_extension=None):
+    Returns:
+        tuple: (keep, description) where keep is a bool and description is a
+               short human-readable summary of the measured value.
+    """
+    if gating == "voiced":
+        voiced = voiced_fraction(record, loudness_threshold_dbfs)
+        description = f"Voiced: {voiced:.0%} of frames at or above {loudness_threshold_dbfs} dBFS"
+        return voiced >= min_voiced_fraction, description
+    if gating == "gated":
+        return record['gated_dbfs'] >= loudness_threshold_dbfs, f"Gated loudness: {record['gated_dbfs']:.2f} dBFS"
+    return record['dbfs'] >= loudness_threshold_dbfs, f"Loudness: {record['dbfs']:.2f} dBFS"
+
+def check_and_delete_if_low_loudness(
+    filepath,
+    loudness_threshold_dbfs,
+    file_extension=None,
+    index=None,
+    gating="dbfs",
+    min_voiced_fraction=0.5,
+    record=None
+):
     """
     Checks an audio file's loudness and deletes it if it's below a threshold.
 
@@ -104,32 +1105,62 @@ def check_and_delete_if_low_loudness(filepath, loudness_threshold_dbfs, file_ext
                                          Files below this will be deleted.
         file_extension (str, optional): The file extension.
                                          If None, it's inferred. Defaults to None.
+        index (utils.audio_index.AudioIndex, optional): Analysis cache to read
+                                         from and update; deleted files are removed from it.
+        gating (str): "dbfs" (default), "gated" or "voiced"; see gate_audio_record.
+        min_voiced_fraction (float): Minimum share of voiced frames for "voiced" gating.
+        record (dict, optional): An analyze_audio record computed elsewhere
+                                 (e.g. by a worker process). If None, the file
+                                 is analysed here.
 
     Returns:
         str: A status string: 'deleted', 'kept', 'skipped_error', or 'delete_failed'.
     """
     filename = os.path.basename(filepath)
-    loudness = get_audio_loudness(filepath, file_extension)
+    if record is None:
+        # Use the full analysis record so the index also learns duration and silence stats
+        record = analyze_audio(filepath, file_extension, index=index, purpose="loudness")
 
-    if loudness is None:
-        print(f"  Skipped (loudness check failed): {filename}")
+    if record is None:
+        log(f"  Skipped (loudness check failed): {filename}")
         return 'skipped_error'
 
-    print(f"  Checking: {filename} (Loudness: {loudness:.2f} dBFS)")
+    keep, description = gate_audio_record(record, loudness_threshold_dbfs, gating, min_voiced_fraction)
+    log(f"  Checking: {filename} ({description})")
 
-    if loudness < loudness_threshold_dbfs:
+    if not keep:
         try:
             os.remove(filepath)
-            print(f"    DELETED: {filename} (Loudness {loudness:.2f} dBFS is below {loudness_threshold_dbfs} dBFS)")
+            if index is not None:
+                index.remove(filepath)
+            log(f"    DELETED: {filename} ({description}, below the {gating} threshold)")
             return 'deleted'
         except Exception as e:
             print(f"    Error deleting {filename}: {e}")
             return 'delete_failed'
     else:
-        print(f"    KEPT: {filename} (Loudness {loudness:.2f} dBFS is at or above {loudness_threshold_dbfs} dBFS)")
+        log(f"    KEPT: {filename} ({description}, meets the {gating} threshold)")
         return 'kept'
 
-def generate_chunk_filename(original_filepath, segment_index, naming_convention, audio_format, original_filename):
+def compute_file_hash(filepath, block_size=1 << 20):
+    """
+    Computes the SHA-256 hash of a file's content, reading it in blocks.
+
+    Args:
+        filepath (str): The path to the file.
+        block_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with stage("hash", os.path.getsize(filepath)), open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def generate_chunk_filename(original_filepath, segment_index, naming_convention, audio_format, original_filename,
+                            source_key=None):
     """
     Generates a filename for an audio chunk based on the specified convention.
 
@@ -139,6 +1170,9 @@ def generate_chunk_filename(original_filepath, segment_index, naming_convention,
         naming_convention (str): The convention to use ("hash" or "indexed").
         audio_format (str): The desired audio format for the chunk (e.g., "wav").
         original_filename (str): The basename of the original file (e.g., "audio.mp3").
+        source_key (str, optional): Identifies the source for "hash" naming instead of
+                                    original_filepath, e.g. a content hash so that chunk
+                                    names survive moving the source tree.
 
     Returns:
         str: The generated filename for the chunk.
@@ -146,7 +1180,7 @@ def generate_chunk_filename(original_filepath, segment_index, naming_convention,
     audio_format = audio_format.lstrip('.') # Ensure no leading dot
 
     if naming_convention == "hash":
-        unique_string = f"{original_filepath}-{segment_index}"
+        unique_string = f"{source_key or original_filepath}-{segment_index}"
         hash_name = hashlib.md5(unique_string.encode()).hexdigest()
         return f"{hash_name}.{audio_format}"
     elif naming_convention == "indexed":
@@ -155,6 +1189,24 @@ def generate_chunk_filename(original_filepath, segment_index, naming_convention,
     else:
         print(f"Warning: Invalid naming convention '{naming_convention}'. Defaulting to 'hash'.")
         # Fallback to hash convention
-        unique_string = f"{original_filepath}-{segment_index}"
+        unique_string = f"{source_key or original_filepath}-{segment_index}"
         hash_name = hashlib.md5(unique_string.encode()).hexdigest()
         return f"{hash_name}.{audio_format}"
+
+def shard_chunk_filename(filename, shard_depth):
+    """
+    Places a "hash" chunk filename in subdirectories named after its leading hex characters.
+
+    Each level uses two characters (256 subdirectories), e.g. with shard_depth=2
+    "3fa2c1....wav" becomes "3f/a2/3fa2c1....wav".
+
+    Args:
+        filename (str): A filename from generate_chunk_filename with "hash" naming.
+        shard_depth (int): Number of subdirectory levels; 0 keeps the name flat.
+
+    Returns:
+        str: The chunk path relative to the output directory, "/"-separated.
+    """
+    if shard_depth <= 0:
+        return filename
+    return "/".join([filename[2 * level:2 * level + 2] for level in range(shard_depth)] + [filename])
@@ -0,0 +1,212 @@
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# The recorder that stage() and log() currently report to, per thread
+# (unset: not instrumented). Threads started by a run record nothing unless
+# they use capture_stages themselves.
+_state = threading.local()
+
+def _current_recorder():
+    return getattr(_state, 'recorder', None)
+
+class StageRecorder:
+    """
+    Accumulates time, call counts and byte counts per named stage.
+
+    Stages used by the dataset tools: "probe" (header/ffprobe metadata),
+    "decode", "analyse" (level statistics), "segment" (choosing cut points),
+    "encode", "write", "hash" (content hashing), "index" (AudioIndex lookups
+    and stores), "fingerprint" and "match" (duplicate search) and "mix"
+    (resampling, gain and limiting in the remix). Byte counts are bytes read
+    from or written to disk.
+    """
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.stages = {}
+
+    def add(self, name, seconds=0.0, nbytes=0, calls=1):
+        totals = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'bytes': 0})
+        totals['seconds'] += seconds
+        totals['calls'] += calls
+        totals['bytes'] += nbytes
+
+    def merge(self, stages):
+        """Adds stage totals collected elsewhere (e.g. returned by a worker process)."""
+        for name, totals in (stages or {}).items():
+            self.add(name, totals['seconds'], totals['bytes'], totals['calls'])
+
+def merge_stages(*stage_dicts):
+    """Combines stage dicts (e.g. a worker's and the main process's for one file) into one."""
+    recorder = StageRecorder()
+    for stages in stage_dicts:
+        recorder.merge(stages)
+    return recorder.stages
+
+@contextmanager
+def stage(name, nbytes=0):
+    """
+    Times the enclosed block as one call of a stage. A no-op when nothing is recorded.
+
+    Args:
+        name (str): The stage name (see StageRecorder).
+        nbytes (int): Bytes read or written by this call, if known up front.
+    """
+    recorder = _current_recorder()
+    if recorder is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - start_time, nbytes)
+
+def timed(name):
+    """Decorator that times every call of a function as one call of a stage."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def add_bytes(name, nbytes):
+    """Adds bytes to a stage without counting a call, e.g. once the size is known."""
+    recorder = _current_recorder()
+    if recorder is not None:
+        recorder.add(name, nbytes=nbytes, calls=0)
+
+def timed_iter(iterable, name):
+    """Yields from iterable, timing each step as one call of the given stage."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+def log(message):
+    """Prints a per-file progress line unless the current run is quiet."""
+    recorder = _current_recorder()
+    if recorder is None or not recorder.quiet:
+        print(message)
+
+@contextmanager
+def capture_stages():
+    """
+    Collects the stages of the enclosed work into a fresh dict.
+
+    Used per file, both in the main process and inside pool workers (where no
+    RunMetrics is active), so the stages can be reported with the file's
+    outcome and passed to RunMetrics.file_done. The quiet setting of the
+    enclosing run, if any, is kept.
+
+    Yields:
+        dict: Stage name -> {'seconds', 'calls', 'bytes'}, filled when the block exits.
+    """
+    previous = _current_recorder()
+    recorder = StageRecorder(quiet=previous.quiet if previous is not None else False)
+    _state.recorder = recorder
+    stages = {}
+    try:
+        yield stages
+    finally:
+        stages.update(recorder.stages)
+        _state.recorder = previous
+
+class RunMetrics(StageRecorder):
+    """
+    Instrumentation for one run of a dataset tool.
+
+    While active (use it as a context manager) it receives the stage timings of
+    audio_utils and audio_index, counts per-file outcomes and, if metrics_path is
+    given, writes one JSON object per line: a "file" event per processed file
+    (path, outcome, stages and tool-specific fields) and a final "summary" event
+    with the totals. With quiet=True the per-file progress prints are dropped.
+
+        with RunMetrics("split", "split_metrics.jsonl", quiet=True) as metrics:
+            ...
+            metrics.file_done(filepath, "ok", stages, chunks=12)
+        metrics.print_summary()
+    """
+
+    def __init__(self, tool, metrics_path=None, quiet=False):
+        """
+        Args:
+            tool (str): Name of the tool, written with every event.
+            metrics_path (str, optional): A JSON lines file to write (overwritten).
+            quiet (bool): If True, log() prints nothing.
+        """
+        super().__init__(quiet=quiet)
+        self.tool = tool
+        self.metrics_path = metrics_path
+        self.outcomes = {}
+        self.wall_seconds = 0.0
+        self._file = None
+        self._previous = None
+        self._start_time = None
+
+    def __enter__(self):
+        if self.metrics_path:
+            self._file = open(self.metrics_path, 'w', encoding='utf-8')
+        self._previous = _current_recorder()
+        _state.recorder = self
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_seconds = time.perf_counter() - self._start_time
+        _state.recorder = self._previous
+        if self._file is not None:
+            self._write(self.summary())
+            self._file.close()
+            self._file = None
+
+    def _write(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def file_done(self, path, outcome, stages=None, **fields):
+        """
+        Records the outcome of one file.
+
+        Args:
+            path (str): The file processed.
+            outcome (str): E.g. 'ok', 'error', 'skipped', 'deleted', 'kept'.
+            stages (dict, optional): The file's stages from capture_stages; added to the totals.
+            **fields: Extra JSON-serialisable values for the file event (e.g. chunks=12).
+        """
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.merge(stages)
+        if self._file is not None:
+            self._write({'event': 'file', 'tool': self.tool, 'path': path, 'outcome': outcome,
+                         'stages': stages or {}, **fields})
+
+    def summary(self):
+        """Returns the run totals as a dict (the "summary" event)."""
+        return {
+            'event': 'summary',
+            'tool': self.tool,
+            'files': sum(self.outcomes.values()),
+            'outcomes': dict(self.outcomes),
+            'wall_seconds': self.wall_seconds,
+            'stages': self.stages,
+        }
+
+    def print_summary(self):
+        """Prints where the time went, one line per stage."""
+        print(f"\n--- Stage Timings ({self.tool}) ---")
+        for name, totals in sorted(self.stages.items(), key=lambda item: -item[1]['seconds']):
+            line = f"  {name:<8} {totals['seconds']:9.2f}s {totals['calls']:8d} calls"
+            if totals['bytes']:
+                line += f" {totals['bytes'] / (1 << 20):10.1f} MB"
+            print(line)
+        print(f"  Wall time: {self.wall_seconds:.2f}s "
+              f"(stage times are summed over worker processes)")
+        if self.metrics_path:
+            print(f"Metrics written to {self.metrics_path}")
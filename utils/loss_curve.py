@@ -1,74 +1,329 @@
+import os
 import re
+import time
+import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 
-def plot_loss_curve(log_file_path="train.log"):
+# Matches the loss line and captures the losses array, step, lr and reference_loss.
+# It looks for "Losses: [...]", "step: X", "lr: Y" and "reference_loss: Z".
+LOSS_PATTERN = re.compile(r"Losses: \[(.*?)\], step: (\d+), lr: ([\w\.+-]+), reference_loss: ([\w\.+-]+)")
+
+# Order of the values in so-vits-svc's "Losses: [...]" list (train.py).
+# Logs with a different number of components get generic loss_<i> names.
+LOSS_COMPONENT_NAMES = ["loss_disc", "loss_gen", "loss_fm", "loss_mel", "loss_kl"]
+
+# Number of leading bytes of the log remembered in the cache to detect rotation.
+LOG_SIGNATURE_BYTES = 256
+
+# Bumped whenever the cache layout changes; older caches are rebuilt.
+CACHE_VERSION = 2
+
+def _default_cache_path(log_file_path):
+    return f"{log_file_path}.losscache.npz"
+
+def _load_cache(cache_path):
+    """Returns the cached parse state, or None if there is no usable cache."""
+    try:
+        with np.load(cache_path) as cache:
+            state = {name: cache[name] for name in cache.files}
+        if int(state.get('version', 0)) != CACHE_VERSION:
+            return None
+        return state
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_cache(cache_path, state):
+    """Writes the cache atomically so an interrupted save never leaves a corrupt file."""
+    temporary_path = f"{cache_path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        np.savez(f, **state)
+    os.replace(temporary_path, cache_path)
+
+def _pad_columns(losses, column_count):
+    """Widens a (rows, columns) loss matrix with NaN columns."""
+    if losses.shape[1] >= column_count:
+        return losses
+    padding = np.full((losses.shape[0], column_count - losses.shape[1]), np.nan)
+    return np.hstack((losses, padding))
+
+def _parse_lines(data):
+    """
+    Extracts every loss component, step, lr and reference loss from complete log lines.
+
+    All loss lines in the chunk are matched in one regex pass and converted to
+    NumPy arrays column by column; the loss lists are joined and parsed by a
+    single np.fromstring call. Only if lines disagree on the number of loss
+    components is each list parsed separately (and padded with NaN).
+
+    Args:
+        data (bytes): One or more complete, newline-terminated log lines.
+
+    Returns:
+        dict: 'steps' (int64), 'losses' (float64, shape (lines, components)),
+              'lr' and 'reference_losses' (float64).
+    """
+    matches = LOSS_PATTERN.findall(data.decode("utf-8", errors="replace"))
+    if not matches:
+        return {
+            'steps': np.zeros(0, dtype=np.int64),
+            'losses': np.zeros((0, 0), dtype=np.float64),
+            'lr': np.zeros(0, dtype=np.float64),
+            'reference_losses': np.zeros(0, dtype=np.float64),
+        }
+
+    losses_strs, steps, lrs, reference_losses = zip(*matches)
+    row_count = len(losses_strs)
+    parsed = {'steps': np.array(steps, dtype=np.int64)}
+    for name, values in (('lr', lrs), ('reference_losses', reference_losses)):
+        try:
+            parsed[name] = np.array(values).astype(np.float64)
+        except ValueError:
+            parsed[name] = np.array([_to_float(value) for value in values], dtype=np.float64)
+
+    column_count = losses_strs[0].count(',') + 1
+    losses = _parse_number_list(",".join(losses_strs))
+    if (losses is not None and losses.size == row_count * column_count
+            and all(row.count(',') + 1 == column_count for row in losses_strs)):
+        parsed['losses'] = losses.reshape(row_count, column_count)
+    else:
+        rows = [_parse_number_list(row) for row in losses_strs]
+        for i, row in enumerate(rows):
+            if row is None:
+                print(f"Warning: Could not parse losses at step {steps[i]}: [{losses_strs[i]}]")
+                rows[i] = np.array([_to_float(value.strip()) for value in losses_strs[i].split(',')])
+        column_count = max(len(row) for row in rows)
+        parsed['losses'] = np.full((row_count, column_count), np.nan)
+        for i, row in enumerate(rows):
+            parsed['losses'][i, :len(row)] = row
+    return parsed
+
+def _parse_number_list(text):
+    """Parses comma-separated numbers in C; returns None if any of them is malformed."""
+    try:
+        return np.fromstring(text, sep=",")
+    except ValueError:
+        return None
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: Could not parse value '{value}' as a number")
+        return float('nan')
+
+def load_loss_log(log_file_path="train.log", cache_path=None, use_cache=True):
+    """
+    Parses a so-vits-svc train.log into typed arrays, resuming from where the last call stopped.
+
+    The byte offset reached and the arrays parsed so far are kept in a sidecar
+    cache (log_file_path + ".losscache.npz"), so each call only reads the lines
+    appended since. If the log was truncated or rotated (it is shorter than the
+    cached offset, or its first bytes changed) it is parsed again from the
+    start. A trailing line that is still being written is left for the next call.
+
+    Args:
+        log_file_path (str): The path to the train.log file.
+        cache_path (str, optional): Where to keep the cache. Defaults to next to the log.
+        use_cache (bool): If False, parse the whole log and leave any cache untouched.
+
+    Returns:
+        dict: 'steps' (int64), 'losses' (float64, shape (points, components),
+              every value of the "Losses: [...]" list, NaN where a line had
+              fewer), 'lr' and 'reference_losses' (float64).
+
+    Raises:
+        FileNotFoundError: If the log file does not exist.
+    """
+    if cache_path is None:
+        cache_path = _default_cache_path(log_file_path)
+
+    with open(log_file_path, 'rb') as f:
+        signature = f.read(LOG_SIGNATURE_BYTES)
+        file_size = os.fstat(f.fileno()).st_size
+
+        state = _load_cache(cache_path) if use_cache else None
+        if state is not None:
+            cached_signature = state['signature'].tobytes()
+            offset = int(state['offset'])
+            # The cached prefix must still be the start of the file
+            if (offset > file_size
+                    or signature[:len(cached_signature)] != cached_signature[:len(signature)]):
+                print(f"Log file {log_file_path} was truncated or rotated; parsing it again from the start.")
+                state = None
+        if state is None:
+            state = _parse_lines(b"")
+            state['offset'] = np.int64(0)
+
+        offset = int(state['offset'])
+        f.seek(offset)
+        data = f.read()
+
+    # Only consume complete lines; a partially written last line is parsed next time
+    complete_length = data.rfind(b"\n") + 1
+    if complete_length > 0:
+        parsed = _parse_lines(data[:complete_length])
+        column_count = max(state['losses'].shape[1], parsed['losses'].shape[1])
+        state['losses'] = np.vstack((
+            _pad_columns(state['losses'], column_count), _pad_columns(parsed['losses'], column_count)
+        ))
+        for name in ('steps', 'lr', 'reference_losses'):
+            state[name] = np.concatenate((state[name], parsed[name]))
+        state['offset'] = np.int64(offset + complete_length)
+        state['signature'] = np.frombuffer(signature, dtype=np.uint8)
+        state['version'] = np.int64(CACHE_VERSION)
+        if use_cache:
+            _save_cache(cache_path, state)
+
+    return {name: state[name] for name in ('steps', 'losses', 'lr', 'reference_losses')}
+
+def parse_loss_log(log_file_path="train.log", cache_path=None, use_cache=True):
+    """
+    Returns the first loss component and the reference loss per step; see load_loss_log.
+
+    Returns:
+        tuple: (steps, losses, reference_losses) as NumPy arrays (int64, float64, float64).
+    """
+    log = load_loss_log(log_file_path, cache_path, use_cache)
+    losses = log['losses'][:, 0] if log['losses'].shape[1] else np.zeros(0)
+    return log['steps'], losses, log['reference_losses']
+
+def loss_component_names(column_count):
+    """Returns column names for a loss matrix with column_count components."""
+    if column_count == len(LOSS_COMPONENT_NAMES):
+        return list(LOSS_COMPONENT_NAMES)
+    return [f"loss_{i}" for i in range(column_count)]
+
+def export_loss_columns(log_file_path, output_path, use_cache=True):
+    """
+    Saves every parsed series of a train.log as named columns.
+
+    The columns are 'step', 'lr', 'reference_loss' and one per loss component
+    (see LOSS_COMPONENT_NAMES). A ".parquet" output_path is written with
+    pyarrow (must be installed); anything else as a NumPy ".npz" archive,
+    readable with np.load(output_path). Comparing runs or checkpoints then
+    only needs these arrays, not the text log.
+
+    Args:
+        log_file_path (str): The path to the train.log file.
+        output_path (str): The .npz or .parquet file to write.
+        use_cache (bool): Reuse the incremental parse cache (see load_loss_log).
+
+    Returns:
+        int: The number of rows written.
+    """
+    log = load_loss_log(log_file_path, use_cache=use_cache)
+    columns = {'step': log['steps'], 'lr': log['lr'], 'reference_loss': log['reference_losses']}
+    for i, name in enumerate(loss_component_names(log['losses'].shape[1])):
+        columns[name] = log['losses'][:, i]
+
+    if output_path.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table(columns), output_path)
+    else:
+        np.savez_compressed(output_path, **columns)
+    print(f"Saved {len(log['steps'])} rows ({', '.join(columns)}) to {output_path}")
+    return len(log['steps'])
+
+def downsample_minmax(x, y, max_points=2000):
+    """
+    Reduces a series to about max_points points while keeping its visual envelope.
+
+    The series is split into max_points // 2 equal buckets and, for every
+    bucket, the points with the smallest and largest y are kept in their
+    original order. Unlike plain striding this never hides loss spikes, and it
+    is fully vectorized, so the cost of drawing stays constant however long
+    training runs.
+
+    Args:
+        x (numpy.ndarray): The x values (e.g. steps), in order.
+        y (numpy.ndarray): The y values, same length as x.
+        max_points (int): The approximate number of points to return.
+
+    Returns:
+        tuple: (x, y) NumPy arrays with at most max_points points.
+    """
+    point_count = len(x)
+    bucket_count = max(1, max_points // 2)
+    if point_count <= max_points:
+        return x, y
+
+    bucket_size = -(-point_count // bucket_count)
+    padded_length = bucket_count * bucket_size
+    # Pad with the last value so padding can never be a bucket's min or max ahead of a real point
+    padded = np.concatenate((y, np.full(padded_length - point_count, y[-1]))).reshape(bucket_count, bucket_size)
+    offsets = np.arange(bucket_count) * bucket_size
+    minimum = offsets + np.argmin(padded, axis=1)
+    maximum = offsets + np.argmax(padded, axis=1)
+
+    keep = np.unique(np.minimum(np.concatenate((minimum, maximum)), point_count - 1))
+    return x[keep], y[keep]
+
+def _draw_loss_curve(axes, steps, losses, reference_losses, max_points):
+    """Draws (or redraws) the two loss curves on a matplotlib Axes."""
+    axes.clear()
+    plot_steps, plot_losses = downsample_minmax(steps, losses, max_points)
+    ref_steps, plot_reference_losses = downsample_minmax(steps, reference_losses, max_points)
+    # Markers only help while individual points are distinguishable
+    marker_size = 4 if len(plot_steps) <= 500 else 0
+
+    axes.plot(plot_steps, plot_losses, marker='o', linestyle='-', color='skyblue', markersize=marker_size, label='First Loss Value')
+    axes.plot(ref_steps, plot_reference_losses, marker='x', linestyle='--', color='salmon', markersize=marker_size, label='Reference Loss') # Plot reference loss
+
+    # Add labels and title
+    axes.set_title('Training Loss and Reference Loss Over Steps', fontsize=16)
+    axes.set_xlabel('Training Step', fontsize=12)
+    axes.set_ylabel('Loss Value', fontsize=12)
+    axes.grid(True, linestyle='--', alpha=0.7)
+    axes.legend() # Show legend for both lines
+
+def _print_no_loss_data():
+    print("No loss data found in the log file matching the pattern.")
+    print("Please ensure the log file contains lines like:")
+    print("2025-06-05 09:15:40,622 44k INFO    Losses: [value1, value2, ...], step: XXX, lr: Y.Ye-Z, reference_loss: RRR")
+
+def plot_loss_curve(log_file_path="train.log", use_cache=True, max_points=2000, output_path=None):
     """
     Parses a log file, extracts loss values and reference loss,
     and plots them as loss curves.
 
     Args:
         log_file_path (str): The path to the train.log file.
+        use_cache (bool): If True (default), reuse the incremental parse cache
+                          (see parse_loss_log) so only new log lines are parsed.
+        max_points (int): Each curve is reduced to about this many points with
+                          downsample_minmax before drawing.
+        output_path (str, optional): If given, save the figure there (PNG, SVG,
+                                     ... by extension) instead of showing it.
+                                     Works without a display.
     """
-    losses = []
-    reference_losses = [] # New list for reference loss
-    steps = []
-    
-    # Updated regular expression to match the loss line and capture
-    # the losses array, step, and reference_loss.
-    # It looks for "Losses: [...]", "step: X", and "reference_loss: Y".
-    loss_pattern = re.compile(r"Losses: \[(.*?)\], step: (\d+), lr: [\d\.e-]+, reference_loss: ([\d\.]+)")
-
     print(f"Attempting to read log file: {log_file_path}")
 
     try:
-        with open(log_file_path, 'r') as f:
-            for line in f:
-                match = loss_pattern.search(line)
-                if match:
-                    # Extract the string representation of the losses list
-                    losses_str = match.group(1)
-                    # Extract the step number
-                    step = int(match.group(2))
-                    # Extract the reference loss
-                    ref_loss = float(match.group(3))
-                    
-                    try:
-                        # Convert the comma-separated string of numbers into a list of floats
-                        current_losses = [float(x.strip()) for x in losses_str.split(',')]
-                        
-                        if current_losses:
-                            losses.append(current_losses[0]) # Still taking the first loss value
-                            steps.append(step)
-                            reference_losses.append(ref_loss) # Add reference loss to its list
-                        
-                    except ValueError as ve:
-                        print(f"Warning: Could not parse losses or reference_loss from line: {line.strip()} - {ve}")
-                    except IndexError:
-                        print(f"Warning: No loss values found in the list on line: {line.strip()}")
-
-        if not losses:
-            print("No loss data found in the log file matching the pattern.")
-            print("Please ensure the log file contains lines like:")
-            print("2025-06-05 09:15:40,622 44k INFO    Losses: [value1, value2, ...], step: XXX, lr: Y.Ye-Z, reference_loss: RRR")
+        steps, losses, reference_losses = parse_loss_log(log_file_path, use_cache=use_cache)
+
+        if len(losses) == 0:
+            _print_no_loss_data()
             return
 
+        if output_path is not None:
+            # Render off-screen so this works on servers without a display
+            plt.switch_backend('Agg')
+
         # Plotting the loss curves
-        plt.figure(figsize=(12, 6))
-        plt.plot(steps, losses, marker='o', linestyle='-', color='skyblue', markersize=4, label='First Loss Value')
-        plt.plot(steps, reference_losses, marker='x', linestyle='--', color='salmon', markersize=4, label='Reference Loss') # Plot reference loss
-        
-        # Add labels and title
-        plt.title('Training Loss and Reference Loss Over Steps', fontsize=16)
-        plt.xlabel('Training Step', fontsize=12)
-        plt.ylabel('Loss Value', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.legend() # Show legend for both lines
-        
+        fig, axes = plt.subplots(figsize=(12, 6))
+        _draw_loss_curve(axes, steps, losses, reference_losses, max_points)
+
         # Improve layout and save/show plot
-        plt.tight_layout()
-        plt.show()
-        print(f"Successfully plotted {len(losses)} loss points.")
+        fig.tight_layout()
+        if output_path is not None:
+            fig.savefig(output_path)
+            plt.close(fig)
+            print(f"Saved plot of {len(losses)} loss points to {output_path}")
+        else:
+            plt.show()
+            print(f"Successfully plotted {len(losses)} loss points.")
 
     except FileNotFoundError:
         print(f"Error: The file '{log_file_path}' was not found.")
@@ -76,5 +331,85 @@ def plot_loss_curve(log_file_path="train.log"):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
+def watch_loss_curve(log_file_path="train.log", interval=30.0, max_points=2000, output_path=None, max_updates=None):
+    """
+    Follows a growing train.log and redraws the loss curves every interval seconds.
+
+    Each refresh parses only the newly appended lines (see parse_loss_log) and
+    draws a downsampled series (see downsample_minmax), so the cost per refresh
+    stays roughly constant over a long run. Stop with Ctrl+C or by closing the window.
+
+    Args:
+        log_file_path (str): The path to the train.log file.
+        interval (float): Seconds between refreshes.
+        max_points (int): Approximate number of points drawn per curve.
+        output_path (str, optional): Headless mode: instead of opening a window,
+                                     overwrite this image (PNG, SVG, ... by
+                                     extension) on every refresh.
+        max_updates (int, optional): Stop after this many refreshes. Default: run until stopped.
+    """
+    headless = output_path is not None
+    if headless:
+        plt.switch_backend('Agg')
+    else:
+        plt.ion()
+
+    fig, axes = plt.subplots(figsize=(12, 6))
+    last_point_count = None
+    update_count = 0
+    print(f"Watching {log_file_path} (refresh every {interval}s, Ctrl+C to stop)")
+
+    try:
+        while max_updates is None or update_count < max_updates:
+            if not headless and not plt.fignum_exists(fig.number):
+                break
+            try:
+                steps, losses, reference_losses = parse_loss_log(log_file_path)
+            except FileNotFoundError:
+                print(f"Waiting for '{log_file_path}' to appear...")
+                steps = None
+
+            if steps is not None and len(steps) != last_point_count:
+                last_point_count = len(steps)
+                if len(steps) == 0:
+                    _print_no_loss_data()
+                else:
+                    _draw_loss_curve(axes, steps, losses, reference_losses, max_points)
+                    fig.tight_layout()
+                    if headless:
+                        temporary_path = f"{output_path}.tmp{os.path.splitext(output_path)[1]}"
+                        fig.savefig(temporary_path)
+                        # Replace atomically so a viewer never reads a half-written image
+                        os.replace(temporary_path, output_path)
+                    print(f"Updated plot: {len(steps)} loss points, last step {steps[-1]}")
+
+            update_count += 1
+            if max_updates is not None and update_count >= max_updates:
+                break
+            if headless:
+                time.sleep(interval)
+            else:
+                plt.pause(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        plt.close(fig)
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Plot so-vits-svc training losses from train.log.")
+    parser.add_argument("log_file", nargs="?", default="so-vits-svc/logs/44k/train.log", help="Path to train.log")
+    parser.add_argument("--watch", action="store_true", help="Keep following the log and redraw periodically")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between refreshes in watch mode")
+    parser.add_argument("--max-points", type=int, default=2000, help="Approximate points drawn per curve")
+    parser.add_argument("--output", help="Save to this PNG/SVG instead of opening a window (headless)")
+    parser.add_argument("--export", help="Write all loss components, lr and reference loss to this .npz/.parquet")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    plot_loss_curve("so-vits-svc/logs/44k/train.log")
+    args = _parse_args()
+    if args.export:
+        export_loss_columns(args.log_file, args.export)
+    elif args.watch:
+        watch_loss_curve(args.log_file, interval=args.interval, max_points=args.max_points, output_path=args.output)
+    else:
+        plot_loss_curve(args.log_file, max_points=args.max_points, output_path=args.output)
@@ -0,0 +1,370 @@
+"""
+Runs the whole dataset preparation as one resumable, non-interactive command:
+
+    separate -> split -> clean -> [dedup] -> length
+
+    python -m utils.prepare_dataset path/to/songs work --split-workers 8 --clean-workers 8 --dedup
+
+Each stage writes a completion marker (with the settings it ran with) to
+<work>/.prepare_state.json. Re-running the same command skips finished stages
+and resumes at the one that failed or was interrupted. Changing a stage's
+settings, or adding, removing or changing input songs, re-runs that stage and
+everything after it; the stages themselves skip work that is already done.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+# Default file name of the stage state, created inside the work directory.
+STATE_FILENAME = ".prepare_state.json"
+
+# Stage name -> stages it needs, in execution order. Dependencies on disabled
+# stages (e.g. "separate" when the input is already vocals) are ignored.
+STAGE_DEPENDENCIES = {
+    'separate': [],
+    'split': ['separate'],
+    'clean': ['split'],
+    'dedup': ['clean'],
+    'length': ['clean', 'dedup'],
+}
+STAGE_ORDER = list(STAGE_DEPENDENCIES)
+
+class StageFailed(Exception):
+    """Raised by a stage that finished but left files it could not process."""
+
+def _stage_directories(work_directory):
+    return {
+        'separated': os.path.join(work_directory, "separated"),
+        'vocals': os.path.join(work_directory, "vocals"),
+        'chunks': os.path.join(work_directory, "chunks"),
+        'metrics': os.path.join(work_directory, "metrics"),
+    }
+
+def _link_or_copy(source, destination):
+    """Hard-links source to destination (copying across filesystems), replacing an older file."""
+    if os.path.exists(destination):
+        if os.path.samefile(source, destination):
+            return
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+def _run_separate(args, directories, metrics_path):
+    # Imported per stage so --help and resumed runs do not pay for unused modules
+    from spleeter_sep.seperate import separate_directory
+
+    results = separate_directory(
+        args.input_path,
+        output_directory=directories['separated'],
+        model=args.model,
+        prefetch=args.prefetch
+    )
+    # separate_directory refuses colliding stem folders; never let two songs share a vocals file either
+    tracks = [result['track'] for result in results]
+    duplicates = sorted({track for track in tracks if tracks.count(track) > 1})
+    if duplicates:
+        raise StageFailed(f"Several sources resolve to the same track name: {', '.join(duplicates)}")
+
+    # Gather one <album>/<track>.wav per song so split names chunks after the song, not "vocals"
+    collected = 0
+    for result in results:
+        if result['status'] == 'error':
+            continue
+        vocals_path = os.path.join(directories['vocals'], f"{result['track']}.wav")
+        os.makedirs(os.path.dirname(vocals_path), exist_ok=True)
+        _link_or_copy(os.path.join(directories['separated'], result['track'], "vocals.wav"), vocals_path)
+        collected += 1
+
+    failed = [result['source'] for result in results if result['status'] == 'error']
+    if failed:
+        raise StageFailed(f"{len(failed)} tracks could not be separated: {', '.join(failed)}")
+    return {'tracks': collected}
+
+def _run_split(args, directories, metrics_path):
+    from utils.audio_split import split_audio_files
+
+    input_directory = directories['vocals'] if args.separate else args.input_path
+    if args.naming == "indexed":
+        # Indexed chunk names only use the file name, so same-titled songs would overwrite each other
+        sources_by_name = {}
+        for root, _, files in os.walk(input_directory):
+            for filename in files:
+                if filename.endswith(f".{args.format}"):
+                    sources_by_name.setdefault(os.path.splitext(filename)[0], []).append(os.path.join(root, filename))
+        clashes = [paths for paths in sources_by_name.values() if len(paths) > 1]
+        if clashes:
+            raise StageFailed("Indexed chunk names would collide for "
+                              + "; ".join(" and ".join(paths) for paths in clashes) + ". Use --naming hash")
+    results = split_audio_files(
+        input_directory,
+        directories['chunks'],
+        audio_format=args.format,
+        segment_duration_ms=args.segment_ms,
+        naming_convention=args.naming,
+        workers=args.split_workers,
+        segmentation=args.segmentation,
+        min_segment_ms=args.min_segment_ms,
+        max_segment_ms=args.max_segment_ms,
+        silence_thresh=args.silence_thresh,
+        incremental=True,  # A resumed split only redoes unfinished sources
+        shard_depth=args.shard_depth,
+        metrics_path=metrics_path,
+        quiet=args.quiet
+    )
+    failed = [result['source'] for result in results if result['status'] == 'error']
+    if failed:
+        raise StageFailed(f"{len(failed)} files could not be split: {', '.join(failed)}")
+    return {'sources': len(results), 'chunks': sum(len(result['chunks']) for result in results)}
+
+def _run_clean(args, directories, metrics_path):
+    from utils.audio_clean import delete_low_loudness_audio_files
+
+    delete_low_loudness_audio_files(
+        directories['chunks'],
+        args.threshold,
+        gating=args.gating,
+        min_voiced_fraction=args.min_voiced_fraction,
+        workers=args.clean_workers,
+        metrics_path=metrics_path,
+        quiet=args.quiet
+    )
+    return {}
+
+def _run_dedup(args, directories, metrics_path):
+    from utils.audio_dedup import find_duplicate_chunks
+
+    groups = find_duplicate_chunks(
+        directories['chunks'],
+        max_distance=args.dedup_max_distance,
+        remove=True,
+        workers=args.dedup_workers,
+        metrics_path=metrics_path,
+        quiet=args.quiet
+    )
+    return {'removed': sum(len(group['duplicates']) for group in groups)}
+
+def _run_length(args, directories, metrics_path):
+    from utils.audio_length_calc import get_audio_total_length
+    from utils.audio_utils import format_duration
+
+    total_seconds = get_audio_total_length(directories['chunks'], metrics_path=metrics_path, quiet=args.quiet)
+    print(f"\nTotal training audio: {format_duration(total_seconds)}")
+    return {'total_seconds': total_seconds}
+
+STAGE_RUNNERS = {
+    'separate': _run_separate,
+    'split': _run_split,
+    'clean': _run_clean,
+    'dedup': _run_dedup,
+    'length': _run_length,
+}
+
+def _input_fingerprint(input_path):
+    """
+    Hashes the names, sizes and mtimes of the files under input_path.
+
+    Cheap enough to compute on every run, and changes whenever a song is
+    added, removed, renamed or rewritten.
+    """
+    if os.path.isfile(input_path):
+        entries = [(os.path.basename(input_path), os.stat(input_path))]
+    else:
+        entries = []
+        for root, _, files in os.walk(input_path):
+            for filename in files:
+                filepath = os.path.join(root, filename)
+                entries.append((os.path.relpath(filepath, input_path), os.stat(filepath)))
+    digest = hashlib.sha1()
+    for name, stat in sorted(entries, key=lambda entry: entry[0]):
+        digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+def _stage_params(stage, args, input_fingerprint=None):
+    """The settings and input a stage's output depends on; a change re-runs the stage."""
+    if stage == 'separate':
+        return {'input_path': os.path.abspath(args.input_path), 'input': input_fingerprint, 'model': args.model}
+    if stage == 'split':
+        return {
+            'input_path': None if args.separate else os.path.abspath(args.input_path),
+            'input': None if args.separate else input_fingerprint,
+            'format': args.format, 'segment_ms': args.segment_ms, 'naming': args.naming,
+            'segmentation': args.segmentation, 'min_segment_ms': args.min_segment_ms,
+            'max_segment_ms': args.max_segment_ms, 'silence_thresh': args.silence_thresh,
+            'shard_depth': args.shard_depth,
+        }
+    if stage == 'clean':
+        return {'threshold': args.threshold, 'gating': args.gating, 'min_voiced_fraction': args.min_voiced_fraction}
+    if stage == 'dedup':
+        return {'max_distance': args.dedup_max_distance}
+    return {}
+
+def _load_state(state_path):
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {state_path} ({e}); running every stage.")
+    return {'stages': {}}
+
+def _save_state(state, state_path):
+    temporary_path = f"{state_path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(temporary_path, state_path)
+
+def plan_stages(enabled, requested, state, params, force=False):
+    """
+    Decides which stages to run, in dependency order.
+
+    A stage runs if it was requested and is not complete with the same params,
+    if force is set for it, or if any stage it depends on runs. Incomplete
+    dependencies of a requested stage are added even if not requested.
+
+    Args:
+        enabled (list): Stages that exist in this run (e.g. without "separate").
+        requested (list): Stages the user asked for.
+        state (dict): The loaded state with completion markers.
+        params (dict): Stage name -> current params.
+        force (bool): Re-run the requested stages even if complete.
+
+    Returns:
+        list: Stage names to run, in order.
+    """
+    def is_complete(stage):
+        marker = state['stages'].get(stage)
+        return marker is not None and marker.get('status') == 'complete' and marker.get('params') == params[stage]
+
+    needed = set(requested)
+    for stage in reversed(STAGE_ORDER):
+        if stage in needed:
+            needed.update(
+                dependency for dependency in STAGE_DEPENDENCIES[stage]
+                if dependency in enabled and not is_complete(dependency)
+            )
+
+    to_run = []
+    for stage in STAGE_ORDER:
+        if stage not in enabled or stage not in needed:
+            continue
+        upstream_runs = any(dependency in to_run for dependency in STAGE_DEPENDENCIES[stage])
+        if upstream_runs or not is_complete(stage) or (force and stage in requested):
+            to_run.append(stage)
+    return to_run
+
+def prepare_dataset(args):
+    """
+    Runs the requested stages with completion markers.
+
+    Returns:
+        bool: True if every stage that ran succeeded.
+    """
+    directories = _stage_directories(args.work_directory)
+    os.makedirs(args.work_directory, exist_ok=True)
+    if args.metrics:
+        os.makedirs(directories['metrics'], exist_ok=True)
+
+    enabled = [stage for stage in STAGE_ORDER
+               if (stage != 'separate' or args.separate) and (stage != 'dedup' or args.dedup)]
+    requested = [stage for stage in (args.stages or enabled) if stage in enabled]
+    input_fingerprint = _input_fingerprint(args.input_path) if os.path.exists(args.input_path) else None
+    params = {stage: _stage_params(stage, args, input_fingerprint) for stage in STAGE_ORDER}
+
+    state_path = os.path.join(args.work_directory, STATE_FILENAME)
+    state = _load_state(state_path)
+    to_run = plan_stages(enabled, requested, state, params, args.force)
+
+    for stage in enabled:
+        if stage not in to_run and stage in requested:
+            print(f"[{stage}] already complete, skipping")
+    if not to_run:
+        return True
+
+    # Later stages are invalid as soon as an earlier one starts again
+    for stage in STAGE_ORDER[STAGE_ORDER.index(to_run[0]):]:
+        if stage in to_run or any(dependency in to_run for dependency in STAGE_DEPENDENCIES[stage]):
+            state['stages'].pop(stage, None)
+    _save_state(state, state_path)
+
+    for stage in to_run:
+        print(f"\n===== [{stage}] =====")
+        metrics_path = os.path.join(directories['metrics'], f"{stage}.jsonl") if args.metrics else None
+        start_time = time.perf_counter()
+        try:
+            summary = STAGE_RUNNERS[stage](args, directories, metrics_path)
+        except (Exception, KeyboardInterrupt) as e:
+            state['stages'][stage] = {'status': 'failed', 'params': params[stage], 'error': str(e) or repr(e)}
+            _save_state(state, state_path)
+            print(f"\n[{stage}] failed: {str(e) or repr(e)}")
+            print(f"Re-run the same command to resume at the {stage} stage.")
+            return False
+        state['stages'][stage] = {
+            'status': 'complete',
+            'params': params[stage],
+            'seconds': time.perf_counter() - start_time,
+            'completed_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'summary': summary,
+        }
+        _save_state(state, state_path)
+        print(f"[{stage}] complete in {state['stages'][stage]['seconds']:.1f}s")
+    return True
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Separate, split, clean, deduplicate and measure a singing dataset in one resumable run."
+    )
+    parser.add_argument("input_path", help="Directory of songs (or of vocals with --no-separate)")
+    parser.add_argument("work_directory", help="Where stems, chunks and the stage state are kept")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_ORDER,
+                        help="Run only these stages (plus any unfinished stages they depend on)")
+    parser.add_argument("--force", action="store_true", help="Re-run the selected stages even if complete")
+    parser.add_argument("--no-separate", dest="separate", action="store_false",
+                        help="The input is already vocals; start at the split stage")
+    parser.add_argument("--dedup", action="store_true", help="Remove near-duplicate chunks after cleaning")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line per file")
+    parser.add_argument("--metrics", action="store_true", help="Write per-stage JSON lines metrics to <work>/metrics")
+
+    workers = parser.add_argument_group("workers")
+    workers.add_argument("--workers", type=int, default=1, help="Default worker processes per stage")
+    workers.add_argument("--split-workers", type=int, help="Worker processes for split")
+    workers.add_argument("--clean-workers", type=int, help="Worker processes for clean")
+    workers.add_argument("--dedup-workers", type=int, help="Worker processes for dedup")
+    workers.add_argument("--prefetch", type=int, default=2, help="Tracks decoded ahead of separation")
+
+    separate = parser.add_argument_group("separate")
+    separate.add_argument("--model", default="spleeter:2stems", help="Spleeter configuration")
+
+    split = parser.add_argument_group("split")
+    split.add_argument("--format", default="wav", help="Audio format of the split input and chunks")
+    split.add_argument("--segmentation", default="silence", choices=["fixed", "silence"])
+    split.add_argument("--segment-ms", type=int, default=5000, help="Chunk length in fixed mode")
+    split.add_argument("--min-segment-ms", type=int, default=5000)
+    split.add_argument("--max-segment-ms", type=int, default=10000)
+    split.add_argument("--silence-thresh", type=float, default=-40.0)
+    split.add_argument("--naming", default="hash", choices=["hash", "indexed"])
+    split.add_argument("--shard-depth", type=int, default=0,
+                       help="Subdirectory levels for hash-named chunks (0: flat, 1: 256 directories)")
+
+    clean = parser.add_argument_group("clean")
+    clean.add_argument("--threshold", type=float, default=-30.0, help="Loudness threshold in dBFS")
+    clean.add_argument("--gating", default="dbfs", choices=["dbfs", "gated", "voiced"])
+    clean.add_argument("--min-voiced-fraction", type=float, default=0.5)
+
+    dedup = parser.add_argument_group("dedup")
+    dedup.add_argument("--dedup-max-distance", type=float, default=0.05,
+                       help="Maximum share of differing fingerprint bits")
+
+    args = parser.parse_args(argv)
+    for name in ("split_workers", "clean_workers", "dedup_workers"):
+        if getattr(args, name) is None:
+            setattr(args, name, args.workers)
+    return args
+
+if __name__ == "__main__":
+    sys.exit(0 if prepare_dataset(_parse_args()) else 1)
@@ -0,0 +1,149 @@
+import os
+import json
+
+from utils.audio_utils import compute_file_hash
+
+# Default file name of the manifest, created inside the split output directory.
+DEFAULT_MANIFEST_FILENAME = ".split_manifest.json"
+MANIFEST_VERSION = 1
+
+class SplitManifest:
+    """
+    Records which sources have been split into an output directory, and how.
+
+    Sources are identified by the hash of their content, so moving or renaming
+    the input tree does not cause them to be split again, and a file present
+    twice is only split once. Each entry stores the split parameters, the
+    chunk filenames produced and whether the split finished. The manifest is
+    rewritten atomically after every change, so an interrupted run leaves
+    unfinished entries that the next run redoes.
+
+    File hashes are cached by path, size and mtime so unchanged sources are
+    not re-read on every run.
+    """
+
+    def __init__(self, output_directory, manifest_path=None):
+        """
+        Args:
+            output_directory (str): The split output directory the manifest describes.
+            manifest_path (str, optional): Where to store the manifest. Defaults to
+                                           DEFAULT_MANIFEST_FILENAME inside output_directory.
+        """
+        self.output_directory = output_directory
+        if manifest_path is None:
+            manifest_path = os.path.join(output_directory, DEFAULT_MANIFEST_FILENAME)
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.file_hashes = {}
+
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.entries = data.get('entries', {})
+                    self.file_hashes = data.get('file_hashes', {})
+                else:
+                    print(f"Warning: Ignoring manifest {manifest_path} with unknown version.")
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read manifest {manifest_path}: {e}")
+
+    def save(self):
+        """Writes the manifest atomically (write to a temporary file, then rename)."""
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'version': MANIFEST_VERSION, 'entries': self.entries, 'file_hashes': self.file_hashes},
+                f, ensure_ascii=False, indent=1
+            )
+        os.replace(temporary_path, self.manifest_path)
+
+    def content_hash(self, filepath):
+        """
+        Returns the content hash of a source file, reusing the cached value if
+        the file's size and mtime are unchanged.
+        """
+        stat = os.stat(filepath)
+        key = os.path.abspath(filepath)
+        cached = self.file_hashes.get(key)
+        if cached is not None and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['hash']
+        content_hash = compute_file_hash(filepath)
+        self.file_hashes[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash}
+        return content_hash
+
+    def is_up_to_date(self, content_hash, params):
+        """
+        Checks whether a source was completely split with the same parameters.
+
+        Chunks deleted since (e.g. by audio_clean or audio_dedup) do not make
+        the source stale, so a later run does not bring them back.
+        """
+        entry = self.entries.get(content_hash)
+        return entry is not None and entry['complete'] and entry['params'] == params
+
+    def existing_chunks(self, content_hash):
+        """Returns the recorded chunk names of a source that are still on disk."""
+        entry = self.entries.get(content_hash, {})
+        return [
+            name for name in entry.get('chunks', [])
+            if os.path.exists(os.path.join(self.output_directory, name))
+        ]
+
+    def begin(self, content_hash, source, params):
+        """
+        Marks a source as being split, deleting chunks from any previous split
+        of it first. Call save() before starting the actual work.
+        """
+        self._delete_chunks(content_hash)
+        self.entries[content_hash] = {'source': source, 'params': params, 'chunks': [], 'complete': False}
+
+    def finish(self, content_hash, chunks, complete=True):
+        """
+        Records the chunks produced for a source and saves the manifest.
+
+        Pass complete=False for a failed split so its partial chunks are
+        recorded and cleaned up by the next run.
+        """
+        entry = self.entries[content_hash]
+        entry['chunks'] = list(chunks)
+        entry['complete'] = complete
+        self.save()
+
+    def remove_missing(self, current_hashes):
+        """
+        Deletes the chunks of sources that are no longer in the input tree
+        (removed, or changed so that their content hash differs).
+
+        Args:
+            current_hashes (set): Content hashes of the sources present now.
+
+        Returns:
+            int: The number of chunk files deleted.
+        """
+        stale = [content_hash for content_hash in self.entries if content_hash not in current_hashes]
+        deleted_count = 0
+        for content_hash in stale:
+            deleted_count += self._delete_chunks(content_hash)
+            del self.entries[content_hash]
+        self.file_hashes = {
+            path: cached for path, cached in self.file_hashes.items() if cached['hash'] in current_hashes
+        }
+        self.save()
+        return deleted_count
+
+    def _delete_chunks(self, content_hash):
+        entry = self.entries.get(content_hash)
+        if entry is None:
+            return 0
+        deleted_count = 0
+        for name in entry['chunks']:
+            try:
+                os.remove(os.path.join(self.output_directory, name))
+                deleted_count += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not delete stale chunk {name}: {e}")
+        entry['chunks'] = []
+        return deleted_count